@@ -1,6 +1,32 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import SerialKey, CustomUser
+from .paginator import EstimatedCountPaginator
+
+
+class ExpiryWindowFilter(admin.SimpleListFilter):
+    """ License status as SQL on end_date, instead of evaluating is_valid per row. """
+    title = 'expiry'
+    parameter_name = 'expiry'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('active', 'Active'),
+            ('7d', 'Expiring in 7 days'),
+            ('30d', 'Expiring in 30 days'),
+            ('expired', 'Expired'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'active':
+            return queryset.valid()
+        if self.value() == '7d':
+            return queryset.expiring_within(7)
+        if self.value() == '30d':
+            return queryset.expiring_within(30)
+        if self.value() == 'expired':
+            return queryset.expired()
+        return queryset
 
 # 1. Register the new CustomUser Model
 @admin.register(CustomUser)
@@ -32,17 +58,24 @@ class CustomUserAdmin(UserAdmin):
 @admin.register(SerialKey)
 class SerialKeyAdmin(admin.ModelAdmin):
     # Added 'allow_inventory' to the display list
-    list_display = ('user', 'key', 'start_date', 'end_date', 'allow_inventory', 'is_active_status')
+    list_display = ('user', 'key', 'start_date', 'end_date', 'allow_inventory', 'rate_tier', 'is_active_status')
     
     # This makes the switch toggleable directly from the list view!
-    list_editable = ('allow_inventory',)
+    list_editable = ('allow_inventory', 'rate_tier')
     
     # CHANGED: Replaced 'user__username' with 'user__phone_number'
     search_fields = ('user__phone_number', 'user__email', 'key')
     
-    list_filter = ('start_date', 'end_date', 'allow_inventory') # Added filter for inventory access
+    list_filter = (ExpiryWindowFilter, 'start_date', 'end_date', 'allow_inventory', 'rate_tier') # Added filter for inventory access
     readonly_fields = ('key',)
 
+    # Large tables: one joined query for the user column, a search box instead of a
+    # dropdown of every user, and no extra COUNT(*) queries
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
     def is_active_status(self, obj):
         return obj.is_valid
     is_active_status.boolean = True
@@ -0,0 +1,11 @@
+import csv
+
+SERIAL_KEY_CSV_HEADER = ['key', 'start_date', 'end_date', 'allow_inventory']
+
+
+def write_serial_keys_csv(keys, stream):
+    """ Writes issued keys as CSV for handing over to a reseller. """
+    writer = csv.writer(stream)
+    writer.writerow(SERIAL_KEY_CSV_HEADER)
+    for key in keys:
+        writer.writerow([key.key, key.start_date.isoformat(), key.end_date.isoformat(), key.allow_inventory])
@@ -0,0 +1,224 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# The RequestStats of the request being handled, if instrumentation is on
+_current = ContextVar('instrumentation_request', default=None)
+
+# Statements kept per request for the slow request log (the slowest ones)
+SLOW_LOG_STATEMENTS = 20
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class RequestStats:
+    """ What one request spent its time on. Filled in by the middleware and its hooks. """
+
+    def __init__(self, keep_sql):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.render_seconds = 0.0
+        self.sql = [] if keep_sql else None
+        self._serializing = 0
+        self._seq = itertools.count()
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_seconds += elapsed
+            if self.sql is not None:
+                # Min-heap of the slowest statements so far
+                entry = (elapsed, next(self._seq), sql)
+                if len(self.sql) < SLOW_LOG_STATEMENTS:
+                    heapq.heappush(self.sql, entry)
+                else:
+                    heapq.heappushpop(self.sql, entry)
+
+
+class MetricsRegistry:
+    """
+    Per-process counters in Prometheus text format. Each worker process keeps
+    its own numbers, so scrape every process (or run one per host).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._views = {}
+
+    def record(self, view, method, status, seconds, stats):
+        status_class = f"{status // 100}xx"
+        with self._lock:
+            key = (view, method, status_class)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+            row = self._views.get((view, method))
+            if row is None:
+                row = self._views[(view, method)] = {
+                    'buckets': [0] * len(DURATION_BUCKETS), 'count': 0, 'sum': 0.0,
+                    'queries': 0, 'db': 0.0, 'serialize': 0.0,
+                }
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    row['buckets'][i] += 1
+            row['count'] += 1
+            row['sum'] += seconds
+            row['queries'] += stats.queries
+            row['db'] += stats.db_seconds
+            row['serialize'] += stats.serialize_seconds + stats.render_seconds
+
+    def render(self):
+        with self._lock:
+            requests = dict(self._requests)
+            views = {key: {**row, 'buckets': list(row['buckets'])} for key, row in self._views.items()}
+
+        lines = [
+            '# HELP http_requests_total Requests handled, by view, method and status class.',
+            '# TYPE http_requests_total counter',
+        ]
+        for (view, method, status_class), count in sorted(requests.items()):
+            lines.append(f'http_requests_total{{view="{view}",method="{method}",status="{status_class}"}} {count}')
+
+        lines += [
+            '# HELP http_request_duration_seconds Time from the first middleware to the response.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for (view, method), row in sorted(views.items()):
+            labels = f'view="{view}",method="{method}"'
+            for bound, count in zip(DURATION_BUCKETS, row['buckets']):
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {row["count"]}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {row["sum"]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {row["count"]}')
+
+        for name, field, help_text in (
+            ('db_queries_total', 'queries', 'SQL statements executed.'),
+            ('db_query_seconds_total', 'db', 'Time spent waiting on SQL.'),
+            ('serialization_seconds_total', 'serialize', 'Time spent in serializer .data and response rendering.'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for (view, method), row in sorted(views.items()):
+                value = row[field] if field == 'queries' else f'{row[field]:.6f}'
+                lines.append(f'{name}{{view="{view}",method="{method}"}} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _patch_serializer_data():
+    """
+    Times BaseSerializer.data, where DRF builds the response dicts. Only the
+    outermost .data of a request counts, so serializers nested via .data
+    aren't counted twice. Installed once, and only when instrumentation is on.
+    """
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data
+    if getattr(original.fget, '_instrumented', False):
+        return
+
+    def data(self):
+        stats = _current.get()
+        if stats is None or stats._serializing:
+            return original.fget(self)
+        stats._serializing += 1
+        started = time.perf_counter()
+        try:
+            return original.fget(self)
+        finally:
+            stats._serializing -= 1
+            stats.serialize_seconds += time.perf_counter() - started
+
+    data._instrumented = True
+    BaseSerializer.data = property(data)
+
+
+class InstrumentationMiddleware:
+    """
+    Records query count, DB time, serialization time and total time of every
+    request. Adds a Server-Timing header (visible in browser dev tools), feeds
+    the /api/metrics/ endpoint and logs requests slower than
+    INSTRUMENTATION_SLOW_REQUEST_MS, with their SQL if INSTRUMENTATION_LOG_SQL.
+
+    With INSTRUMENTATION_ENABLED off, Django drops the middleware at startup,
+    so it costs nothing.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'INSTRUMENTATION_SLOW_REQUEST_MS', None)
+        self.log_sql = getattr(settings, 'INSTRUMENTATION_LOG_SQL', False)
+        _patch_serializer_data()
+
+    def __call__(self, request):
+        stats = RequestStats(keep_sql=self.log_sql and self.slow_ms is not None)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"',
+            f'serialize;dur={stats.serialize_seconds * 1000:.1f}',
+            f'render;dur={stats.render_seconds * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+        match = request.resolver_match
+        # Route names, not paths, keep the label set small
+        view = match.view_name if match else 'unresolved'
+        registry.record(view, request.method, response.status_code, total, stats)
+
+        if self.slow_ms is not None and total * 1000 >= self.slow_ms:
+            self._log_slow(request, response, total, stats)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses render right after this hook; the callback runs once they have
+        stats = _current.get()
+        if stats is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                stats.render_seconds += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def _log_slow(self, request, response, total, stats):
+        message = (
+            f"Slow request {request.method} {request.path} -> {response.status_code}: "
+            f"{total * 1000:.0f}ms total, {stats.queries} queries in {stats.db_seconds * 1000:.0f}ms, "
+            f"serialize {stats.serialize_seconds * 1000:.0f}ms, render {stats.render_seconds * 1000:.0f}ms"
+        )
+        if stats.sql:
+            message += "\nSlowest statements:"
+            message += ''.join(f"\n  [{elapsed * 1000:.1f}ms] {sql}" for elapsed, _, sql in sorted(stats.sql, reverse=True))
+        logger.warning(message)
@@ -0,0 +1,42 @@
+import sys
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.csv_export import write_serial_keys_csv
+from core.models import SerialKey
+
+
+class Command(BaseCommand):
+    """
+    Issues a batch of unassigned license keys and exports them as CSV:
+
+        python manage.py issue_serial_keys 50000 --days 365 --allow-inventory -o batch.csv
+    """
+    help = "Bulk-create serial keys and export them as CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int)
+        parser.add_argument('--days', type=int, default=365, help="License length from today")
+        parser.add_argument('--allow-inventory', action='store_true')
+        parser.add_argument('-o', '--output', help="CSV file to write (default: stdout)")
+
+    def handle(self, *args, **options):
+        start_date = timezone.now()
+        end_date = start_date + timedelta(days=options['days'])
+
+        started = time.perf_counter()
+        keys = SerialKey.objects.issue_batch(
+            options['count'], start_date, end_date, allow_inventory=options['allow_inventory']
+        )
+        elapsed = time.perf_counter() - started
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as f:
+                write_serial_keys_csv(keys, f)
+        else:
+            write_serial_keys_csv(keys, sys.stdout)
+
+        self.stderr.write(self.style.SUCCESS(f"Issued {len(keys)} keys in {elapsed:.2f}s"))
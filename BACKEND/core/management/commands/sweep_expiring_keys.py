@@ -0,0 +1,77 @@
+import logging
+from datetime import timedelta
+
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.db.models import Q, F
+from django.utils import timezone
+
+from core.models import SerialKey
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Daily license sweep, run from cron:
+
+        python manage.py sweep_expiring_keys --days 7 --deactivate
+
+    Emails owners of keys expiring within --days (once per expiry date; a renewed
+    key is notified again before its new end date) and, with --deactivate, turns
+    off feature switches on expired keys. Works on indexed end_date ranges in
+    batches, never loading the whole table.
+    """
+    help = "Notify owners of expiring license keys and deactivate expired ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help="Notification window before end_date")
+        parser.add_argument('--deactivate', action='store_true', help="Turn off allow_inventory on expired keys")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        window = timedelta(days=options['days'])
+
+        due = SerialKey.objects.expiring_within(options['days'], at=now).filter(
+            user__isnull=False
+        ).filter(
+            # Never notified, or notified about an earlier end date
+            Q(expiry_notified_at__isnull=True) | Q(expiry_notified_at__lt=F('end_date') - window)
+        )
+        notified = self._in_batches(due, options['batch_size'], self._notify, now)
+        self.stdout.write(f"Notified {notified} expiring keys.")
+
+        if options['deactivate']:
+            expired = SerialKey.objects.expired(at=now).filter(allow_inventory=True)
+            deactivated = self._in_batches(expired, options['batch_size'], self._deactivate, now)
+            self.stdout.write(f"Deactivated {deactivated} expired keys.")
+
+        self.stdout.write(self.style.SUCCESS("Sweep complete."))
+
+    def _in_batches(self, queryset, batch_size, process, now):
+        # Keyset pagination on pk: each batch is an index range scan, whatever the table size
+        total, last_pk = 0, 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk').select_related('user')[:batch_size])
+            if not batch:
+                return total
+            process(batch, now)
+            total += len(batch)
+            last_pk = batch[-1].pk
+
+    def _notify(self, keys, now):
+        for key in keys:
+            if key.user.email:
+                send_mail(
+                    "Your Modern Tracker license is expiring",
+                    f"Your license {key.key} expires on {key.end_date:%Y-%m-%d}. Renew it to keep access.",
+                    None,
+                    [key.user.email],
+                    fail_silently=True,
+                )
+            logger.info("License %s for user %s expires %s", key.key, key.user_id, key.end_date)
+        SerialKey.objects.filter(pk__in=[k.pk for k in keys]).update(expiry_notified_at=now)
+
+    def _deactivate(self, keys, now):
+        SerialKey.objects.filter(pk__in=[k.pk for k in keys]).update(allow_inventory=False)
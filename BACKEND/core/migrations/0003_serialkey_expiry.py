@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_serialkey_allow_inventory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serialkey',
+            name='expiry_notified_at',
+            field=models.DateTimeField(blank=True, help_text='Set by sweep_expiring_keys', null=True),
+        ),
+        migrations.AlterField(
+            model_name='serialkey',
+            name='end_date',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
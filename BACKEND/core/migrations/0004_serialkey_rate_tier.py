@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_serialkey_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serialkey',
+            name='rate_tier',
+            field=models.CharField(choices=[('basic', 'Basic'), ('standard', 'Standard'), ('premium', 'Premium')], default='standard', max_length=20),
+        ),
+    ]
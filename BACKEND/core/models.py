@@ -1,5 +1,6 @@
-import uuid
-from django.db import models
+import secrets
+from datetime import timedelta
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils import timezone
 from django.conf import settings  # We use this to refer to the user model
@@ -33,8 +34,63 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.phone_number
 
-# 3. Update SerialKey to link to the new Custom User
+# 3. Serial key generation
+def generate_key():
+    """ Random 64-bit key formatted as XXXX-XXXX-XXXX-XXXX. """
+    raw = secrets.token_hex(8).upper()
+    return f"{raw[:4]}-{raw[4:8]}-{raw[8:12]}-{raw[12:16]}"
+
+class SerialKeyQuerySet(models.QuerySet):
+    # SQL equivalents of SerialKey.is_valid, so expiry queries can use the end_date index
+
+    def valid(self, at=None):
+        at = at or timezone.now()
+        return self.filter(start_date__lte=at, end_date__gte=at)
+
+    def expired(self, at=None):
+        return self.filter(end_date__lt=at or timezone.now())
+
+    def expiring_within(self, days, at=None):
+        at = at or timezone.now()
+        return self.filter(end_date__gte=at, end_date__lt=at + timedelta(days=days))
+
+class SerialKeyManager(models.Manager.from_queryset(SerialKeyQuerySet)):
+    def issue_batch(self, count, start_date, end_date, allow_inventory=False, chunk_size=2000):
+        """
+        Creates `count` unassigned keys with bulk_create, chunk by chunk.
+        Candidates are checked against existing keys with one query per chunk
+        and regenerated on collision, so large license batches never trip the
+        unique constraint. Returns the created keys.
+        """
+        issued = []
+        while len(issued) < count:
+            size = min(chunk_size, count - len(issued))
+            keys = self._unused_keys(size, taken={k.key for k in issued})
+            batch = [
+                self.model(key=key, start_date=start_date, end_date=end_date, allow_inventory=allow_inventory)
+                for key in keys
+            ]
+            try:
+                with transaction.atomic():
+                    self.bulk_create(batch)
+            except IntegrityError:
+                # Another process issued one of these keys since we checked; redo this chunk
+                continue
+            issued.extend(batch)
+        return issued
+
+    def _unused_keys(self, size, taken):
+        keys = set()
+        while len(keys) < size:
+            candidates = {generate_key() for _ in range(size - len(keys))} - taken - keys
+            existing = set(self.filter(key__in=candidates).values_list('key', flat=True))
+            keys |= candidates - existing
+        return keys
+
+# 4. Update SerialKey to link to the new Custom User
 class SerialKey(models.Model):
+    RATE_TIERS = [('basic', 'Basic'), ('standard', 'Standard'), ('premium', 'Premium')]
+
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,  # CHANGED: Reference the custom model dynamically
         on_delete=models.CASCADE, 
@@ -45,18 +101,32 @@ class SerialKey(models.Model):
     
     key = models.CharField(max_length=100, unique=True, blank=True)
     start_date = models.DateTimeField()
-    end_date = models.DateTimeField()
+    end_date = models.DateTimeField(db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    expiry_notified_at = models.DateTimeField(null=True, blank=True, help_text="Set by sweep_expiring_keys")
     # Feature Switches
     allow_inventory = models.BooleanField(default=False, help_text="Toggle this to allow access to the Inventory App")
+    # API rate limits, see THROTTLE_TIERS in settings
+    rate_tier = models.CharField(max_length=20, choices=RATE_TIERS, default='standard')
+
+    objects = SerialKeyManager()
 
     def save(self, *args, **kwargs):
-        if not self.key:
-            raw_uuid = str(uuid.uuid4()).replace('-', '').upper()
-            raw = raw_uuid[:16]
-            self.key = f"{raw[:4]}-{raw[4:8]}-{raw[8:12]}-{raw[12:16]}"
-            
-        super().save(*args, **kwargs)
+        if self.key:
+            return super().save(*args, **kwargs)
+
+        # Retry with a fresh key if the generated one happens to exist already
+        for attempt in range(5):
+            self.key = generate_key()
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # Only a key collision is worth retrying (not e.g. a user who already has a key)
+                if attempt == 4 or not SerialKey.objects.filter(key=self.key).exists():
+                    self.key = ''
+                    raise
+                self.key = ''
 
     @property
     def is_valid(self):
@@ -0,0 +1,47 @@
+import datetime
+
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# DRF's own fallbacks (Decimal -> float, lazy strings, timedelta, querysets...),
+# so switching renderers doesn't change what any response looks like
+_drf_default = JSONEncoder().default
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Drop-in for DRF's JSONRenderer built on orjson, which encodes large lists
+    several times faster. Output matches JSONRenderer's compact UTF-8 form,
+    including datetimes ending in 'Z'.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_drf_default, option=self.options)
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, datetime.datetime):
+        # Same text as the JSON responses, so clients parse one format
+        return orjson.dumps(obj, option=orjson.OPT_UTC_Z)[1:-1].decode()
+    return _drf_default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """ Same payloads as JSON, served to clients sending Accept: application/msgpack. """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_msgpack_default, datetime=False)
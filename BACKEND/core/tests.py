@@ -1,3 +1,104 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import CustomUser, SerialKey
+
+
+class ActivateKeyConcurrencyTests(TransactionTestCase):
+    # Real commits are needed so each thread's connection sees the others' writes
+
+    def setUp(self):
+        now = timezone.now()
+        self.key = SerialKey.objects.create(start_date=now, end_date=now + timedelta(days=30))
+        self.users = [CustomUser.objects.create_user(phone_number=f"100{i}") for i in range(8)]
+
+    def _activate(self, user, results, barrier):
+        client = APIClient()
+        client.force_authenticate(user)
+        barrier.wait()
+        try:
+            results.append(client.post('/api/activate/', {'key': self.key.key}, format='json').status_code)
+        finally:
+            connection.close()
+
+    def test_parallel_activations_of_one_key_have_a_single_winner(self):
+        results, barrier = [], threading.Barrier(len(self.users))
+        threads = [threading.Thread(target=self._activate, args=(user, results, barrier)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(200), 1)
+        self.assertEqual(results.count(409), len(self.users) - 1)
+        self.key.refresh_from_db()
+        self.assertIn(self.key.user, self.users)
+
+    def test_activating_a_new_key_detaches_the_old_one(self):
+        user = self.users[0]
+        now = timezone.now()
+        old_key = SerialKey.objects.create(user=user, start_date=now, end_date=now + timedelta(days=30))
+
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/activate/', {'key': self.key.key}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        old_key.refresh_from_db()
+        self.key.refresh_from_db()
+        self.assertIsNone(old_key.user)
+        self.assertEqual(self.key.user, user)
+
+
+@override_settings(THROTTLE_TIERS={
+    'basic': {'capacity': 10, 'refill_per_second': 0.001},
+    'standard': {'capacity': 40, 'refill_per_second': 0.001},
+})
+class TenantThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.user = CustomUser.objects.create_user(phone_number="2000")
+        self.key = SerialKey.objects.create(
+            user=self.user, allow_inventory=True, rate_tier='basic', start_date=now, end_date=now + timedelta(days=1),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Buckets are keyed by user id, which later tests may reuse
+        self.addCleanup(cache.clear)
+
+    def test_expensive_actions_drain_the_bucket_faster(self):
+        # dashboard_stats costs 20, more than a basic bucket holds
+        response = self.client.get('/api/inventory/analytics/dashboard_stats/')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        # Cheap reads still go through
+        self.assertEqual(self.client.get('/api/inventory/orders/').status_code, 200)
+
+    def test_bucket_size_follows_the_serial_key_tier(self):
+        statuses = [self.client.get('/api/inventory/orders/').status_code for _ in range(11)]
+        self.assertEqual(statuses.count(200), 10)
+        self.assertEqual(statuses[-1], 429)
+
+        self.key.rate_tier = 'standard'
+        self.key.save()
+        cache.clear()
+        self.assertEqual(self.client.get('/api/inventory/analytics/dashboard_stats/').status_code, 200)
+
+    def test_tenants_have_separate_buckets(self):
+        for _ in range(10):
+            self.client.get('/api/inventory/orders/')
+        other = CustomUser.objects.create_user(phone_number="2001")
+        now = timezone.now()
+        SerialKey.objects.create(user=other, allow_inventory=True, rate_tier='basic', start_date=now, end_date=now + timedelta(days=1))
+        client = APIClient()
+        client.force_authenticate(other)
+        self.assertEqual(self.client.get('/api/inventory/orders/').status_code, 429)
+        self.assertEqual(client.get('/api/inventory/orders/').status_code, 200)
@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+# Cost of a request whose view doesn't list its action in throttle_costs
+DEFAULT_READ_COST = 1
+DEFAULT_WRITE_COST = 2
+
+
+class TenantTokenBucketThrottle(BaseThrottle):
+    """
+    One token bucket per account, kept in the default cache. Every request
+    spends tokens, and views price their expensive actions through
+    `throttle_costs` ({action: tokens}), so a tenant polling exports or the
+    dashboard runs dry long before one browsing product pages. Buckets refill
+    continuously; capacity and refill rate come from the tier on the account's
+    SerialKey (settings.THROTTLE_TIERS).
+
+    Set CACHE_REDIS_URL in production so all workers draw from the same
+    bucket; the in-memory default gives every process its own. Like DRF's own throttles, the read-modify-write isn't
+    atomic: concurrent requests may occasionally both spend the last tokens.
+    """
+    cache = cache
+
+    def allow_request(self, request, view):
+        self.deficit = 0
+        user = request.user
+        if not getattr(settings, 'TENANT_THROTTLE_ENABLED', True) or not user or not user.is_authenticated:
+            return True
+
+        limits = self.get_limits(user)
+        cost = self.get_cost(request, view)
+        key = f"throttle:tenant:{user.pk}"
+        # Wall clock, since the bucket is shared between processes
+        now = time.time()
+
+        tokens, stamp = self.cache.get(key) or (limits['capacity'], now)
+        tokens = min(limits['capacity'], tokens + (now - stamp) * limits['refill_per_second'])
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        else:
+            self.deficit = cost - tokens
+            self.refill = limits['refill_per_second']
+        # Kept until a full refill, after which a new bucket is the same thing
+        self.cache.set(key, (tokens, now), timeout=int(limits['capacity'] / limits['refill_per_second']) + 1)
+        return allowed
+
+    def wait(self):
+        return self.deficit / self.refill if self.deficit else None
+
+    def get_limits(self, user):
+        tiers = settings.THROTTLE_TIERS
+        key = getattr(user, 'serial_key', None)
+        return tiers.get(key.rate_tier if key else None) or tiers[settings.THROTTLE_DEFAULT_TIER]
+
+    def get_cost(self, request, view):
+        costs = getattr(view, 'throttle_costs', {})
+        cost = costs.get(getattr(view, 'action', None))
+        if cost is not None:
+            return cost
+        return DEFAULT_READ_COST if request.method in SAFE_METHODS else DEFAULT_WRITE_COST
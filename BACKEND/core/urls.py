@@ -3,7 +3,7 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
-from .views import current_user_view, activate_key_view
+from .views import current_user_view, activate_key_view, issue_keys_view, metrics_view
 
 urlpatterns = [
     # This is your Login Endpoint
@@ -12,4 +12,6 @@ urlpatterns = [
 
     path('me/', current_user_view, name='current_user'),
     path('activate/', activate_key_view, name='activate_key'),
+    path('keys/issue/', issue_keys_view, name='issue_keys'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
\ No newline at end of file
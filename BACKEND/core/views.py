@@ -1,11 +1,21 @@
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+import secrets
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
 from django.utils import timezone
+from datetime import timedelta
+from .csv_export import write_serial_keys_csv
+from .instrumentation import registry
 from .models import SerialKey
 from .serializers import UserSerializer
 
+MAX_KEYS_PER_BATCH = 100_000
+MAX_KEY_DAYS = 3650
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -22,35 +32,82 @@ def activate_key_view(request):
     if not key_input:
         return Response({'error': 'Key is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        # 1. Find the key
-        serial_key = SerialKey.objects.get(key=key_input)
-
-        # 2. Check if it belongs to someone else
-        if serial_key.user and serial_key.user != request.user:
-            return Response({'error': 'This key is already used by another account.'}, status=status.HTTP_409_CONFLICT)
+    # Everything below runs in one transaction: read the key with a row lock, detach
+    # the user's old key, then claim the new one with UPDATE ... WHERE user IS NULL.
+    # Two users racing for the same key can't both win, and it's three statements.
+    with transaction.atomic():
+        # 1. Find the key (locked until commit on backends that support it)
+        serial_key = (
+            SerialKey.objects.select_for_update()
+            .filter(key=key_input)
+            .values('id', 'user_id', 'end_date')
+            .first()
+        )
+        if serial_key is None:
+            return Response({'error': 'Invalid key provided.'}, status=status.HTTP_404_NOT_FOUND)
 
-        # 3. Check if it's already YOURS (Idempotency)
-        if serial_key.user == request.user:
+        # 2. Check if it's already YOURS (Idempotency)
+        if serial_key['user_id'] == request.user.pk:
             return Response({'message': 'You already have this key active.'}, status=status.HTTP_200_OK)
 
-        # 4. Check expiration (Optional: You might want to allow claiming expired keys for history, but usually no)
-        if serial_key.end_date < timezone.now():
+        # 3. Check if it belongs to someone else
+        if serial_key['user_id'] is not None:
+            return Response({'error': 'This key is already used by another account.'}, status=status.HTTP_409_CONFLICT)
+
+        # 4. Check expiration
+        if serial_key['end_date'] < timezone.now():
             return Response({'error': 'This key has expired.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 5. Check if User already has a DIFFERENT key (Optional, depends on business logic)
-        # If you want to overwrite their old key, we need to handle the OneToOne constraint.
-        # Since OneToOne implies 1 user = 1 key, if they claim a new one, we must disconnect the old one first.
-        if hasattr(request.user, 'serial_key'):
-            old_key = request.user.serial_key
-            old_key.user = None
-            old_key.save()
+        # 5. OneToOne means 1 user = 1 key, so disconnect any key the user holds now
+        SerialKey.objects.filter(user=request.user).update(user=None)
+
+        # 6. ACTIVATE: only succeeds if nobody claimed the key since step 1
+        claimed = SerialKey.objects.filter(pk=serial_key['id'], user__isnull=True).update(user=request.user)
+        if not claimed:
+            # Keep the old key attached
+            transaction.set_rollback(True)
+            return Response({'error': 'This key is already used by another account.'}, status=status.HTTP_409_CONFLICT)
+
+    return Response({'message': 'License activated successfully!'}, status=status.HTTP_200_OK)
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def issue_keys_view(request):
+    # Staff-only: bulk-create unassigned keys for a reseller and download them as CSV
+    try:
+        count = int(request.data.get('count', 0))
+        days = int(request.data.get('days', 365))
+    except (TypeError, ValueError):
+        return Response({'error': 'count and days must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        allow_inventory = serializers.BooleanField().run_validation(request.data.get('allow_inventory', False))
+    except serializers.ValidationError:
+        return Response({'error': 'allow_inventory must be true or false.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not 0 < count <= MAX_KEYS_PER_BATCH:
+        return Response({'error': f'count must be between 1 and {MAX_KEYS_PER_BATCH}.'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 0 < days <= MAX_KEY_DAYS:
+        return Response({'error': f'days must be between 1 and {MAX_KEY_DAYS}.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 6. ACTIVATE: Assign the key to the user
-        serial_key.user = request.user
-        serial_key.save()
+    start_date = timezone.now()
+    keys = SerialKey.objects.issue_batch(
+        count, start_date, start_date + timedelta(days=days),
+        allow_inventory=allow_inventory,
+    )
 
-        return Response({'message': 'License activated successfully!'}, status=status.HTTP_200_OK)
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="serial-keys-{start_date:%Y%m%d-%H%M%S}.csv"'
+    write_serial_keys_csv(keys, response)
+    return response
 
-    except SerialKey.DoesNotExist:
-        return Response({'error': 'Invalid key provided.'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+def metrics_view(request):
+    """
+    Prometheus scrape target for the instrumentation middleware. Plain Django
+    view so scrapes skip DRF and JWT; send "Authorization: Bearer <METRICS_TOKEN>"
+    or be logged into the admin as staff.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not (token and secrets.compare_digest(supplied, token)) and not request.user.is_staff:
+        return HttpResponse(status=403)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
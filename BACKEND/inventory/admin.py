@@ -1,19 +1,36 @@
 from django.contrib import admin
+from django.db.models import Sum
+from core.paginator import EstimatedCountPaginator
 from .models import (
     Category, Supplier, Product, ProductKit, 
     Warehouse, Location, Batch, Stock, 
-    InventoryTransaction, Order, OrderItem
+    InventoryTransaction, Order, OrderItem, Job,
+    TransferOrder, TransferLine, CycleCount, SalesRollup,
+    LedgerCheckpoint, TransactionArchive
 )
 
 # --- INLINES ---
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 1
+    autocomplete_fields = ('product',)
+    # Snapshots taken by Order.complete()
+    readonly_fields = ('unit_cost', 'category')
 
 class ProductKitInline(admin.TabularInline):
     model = ProductKit
     fk_name = 'parent_product'
     extra = 1
+    autocomplete_fields = ('child_product',)
+
+class TransferLineInline(admin.TabularInline):
+    model = TransferLine
+    extra = 1
+    autocomplete_fields = ('product',)
+
+# Changelists below follow the same rules so they stay fast for large tenants:
+# list_select_related for every FK shown in a column or __str__, autocomplete
+# widgets instead of <select>s listing every row, and no facet/full-count queries.
 
 # --- ADMIN CLASSES ---
 
@@ -21,58 +38,149 @@ class ProductKitInline(admin.TabularInline):
 class CategoryAdmin(admin.ModelAdmin):
     # Added 'owner' so you can see who owns which category
     list_display = ('name', 'parent', 'owner')
-    search_fields = ('name',)
-    list_filter = ('owner',)
+    # Owners are found by exact phone number: a filter would list every account
+    search_fields = ('name', '=owner__phone_number')
+    list_select_related = ('parent', 'owner')
+    autocomplete_fields = ('parent', 'owner')
+    show_facets = admin.ShowFacets.NEVER
 
 @admin.register(Supplier)
 class SupplierAdmin(admin.ModelAdmin):
     list_display = ('name', 'contact_email', 'lead_time_days', 'owner')
     search_fields = ('name', 'contact_email')
+    list_select_related = ('owner',)
+    autocomplete_fields = ('owner',)
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('sku', 'name', 'category', 'selling_price', 'total_stock_display', 'owner')
-    search_fields = ('sku', 'name', 'barcode')
-    list_filter = ('category', 'is_batch_tracked', 'owner')
+    # Category is searched rather than filtered: a sidebar would list every tenant's categories
+    search_fields = ('sku', 'name', 'barcode', 'category__name', '=owner__phone_number')
+    list_filter = ('is_batch_tracked',)
     inlines = [ProductKitInline]
+    list_select_related = ('category', 'owner')
+    autocomplete_fields = ('category', 'owner')
+    show_facets = admin.ShowFacets.NEVER
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Totals come from the changelist query itself rather than one aggregate per row
+        return super().get_queryset(request).annotate(stock_total=Sum('stock__quantity'))
 
     def total_stock_display(self, obj):
-        from django.db.models import Sum
         # Safely handle cases where stock is None
-        result = obj.stock_set.aggregate(total=Sum('quantity'))['total']
-        return result if result is not None else 0
+        return obj.stock_total if obj.stock_total is not None else 0
     total_stock_display.short_description = "Total Stock"
+    total_stock_display.admin_order_field = 'stock_total'
 
 @admin.register(Warehouse)
 class WarehouseAdmin(admin.ModelAdmin):
     list_display = ('name', 'address', 'owner')
+    search_fields = ('name',)
+    list_select_related = ('owner',)
+    autocomplete_fields = ('owner',)
 
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
-    list_display = ('name', 'warehouse')
-    list_filter = ('warehouse',)
+    list_display = ('name', 'warehouse', 'zone', 'aisle', 'bay', 'level', 'capacity')
+    # Warehouse and zone filters would list every tenant's; search by name or exact zone instead
+    search_fields = ('name', 'warehouse__name', '=zone')
+    list_select_related = ('warehouse',)
+    autocomplete_fields = ('warehouse',)
+    show_facets = admin.ShowFacets.NEVER
 
 @admin.register(Stock)
 class StockAdmin(admin.ModelAdmin):
     list_display = ('product', 'location', 'quantity', 'batch')
-    list_filter = ('location__warehouse', 'product')
-    search_fields = ('product__sku', 'product__name')
+    # Filtering is done through search; a sidebar listing every product or warehouse doesn't scale
+    search_fields = ('product__sku', 'product__name', 'location__name', 'location__warehouse__name')
+    list_select_related = ('product', 'location__warehouse', 'batch__product')
+    autocomplete_fields = ('product', 'location', 'batch')
+    paginator = EstimatedCountPaginator
+    show_facets = admin.ShowFacets.NEVER
+    show_full_result_count = False
 
 @admin.register(InventoryTransaction)
 class InventoryTransactionAdmin(admin.ModelAdmin):
     # FIXED: Changed 'created_by' to 'owner'
     list_display = ('created_at', 'transaction_type', 'product', 'quantity', 'owner')
-    list_filter = ('transaction_type', 'created_at', 'owner')
-    search_fields = ('reference', 'product__sku')
+    list_filter = ('transaction_type', 'created_at')
+    search_fields = ('reference', 'product__sku', '=owner__phone_number')
     # FIXED: Changed 'created_by' to 'owner'
     readonly_fields = ('created_at', 'owner')
+    list_select_related = ('product', 'owner')
+    autocomplete_fields = ('product', 'source_location', 'destination_location')
+    paginator = EstimatedCountPaginator
+    show_facets = admin.ShowFacets.NEVER
+    show_full_result_count = False
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'order_type', 'status', 'supplier', 'customer_name', 'created_at', 'owner')
-    list_filter = ('order_type', 'status', 'created_at', 'owner')
+    list_filter = ('order_type', 'status', 'created_at')
+    search_fields = ('customer_name', '=owner__phone_number')
     inlines = [OrderItemInline]
+    list_select_related = ('supplier', 'owner')
+    autocomplete_fields = ('supplier', 'owner')
+    show_facets = admin.ShowFacets.NEVER
+    show_full_result_count = False
     
 @admin.register(Batch)
 class BatchAdmin(admin.ModelAdmin):
-    list_display = ('batch_number', 'product', 'expiry_date')
\ No newline at end of file
+    list_display = ('batch_number', 'product', 'expiry_date')
+    search_fields = ('batch_number', 'product__sku')
+    list_select_related = ('product',)
+    autocomplete_fields = ('product',)
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'job_type', 'status', 'attempts', 'created_at', 'finished_at', 'owner')
+    list_filter = ('status', 'job_type')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+    list_select_related = ('owner',)
+    autocomplete_fields = ('owner',)
+
+@admin.register(TransferOrder)
+class TransferOrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'source_location', 'destination_location', 'status', 'created_at', 'owner')
+    list_filter = ('status', 'created_at')
+    inlines = [TransferLineInline]
+    list_select_related = ('source_location__warehouse', 'destination_location__warehouse', 'owner')
+    autocomplete_fields = ('source_location', 'destination_location', 'owner')
+    readonly_fields = ('completed_at',)
+    show_facets = admin.ShowFacets.NEVER
+
+@admin.register(CycleCount)
+class CycleCountAdmin(admin.ModelAdmin):
+    # No lines inline: a warehouse count can hold tens of thousands of them
+    list_display = ('id', 'warehouse', 'location', 'status', 'created_at', 'posted_at', 'owner')
+    list_filter = ('status', 'created_at')
+    list_select_related = ('warehouse', 'location__warehouse', 'owner')
+    autocomplete_fields = ('warehouse', 'location', 'owner')
+    readonly_fields = ('posted_at',)
+    show_facets = admin.ShowFacets.NEVER
+
+@admin.register(LedgerCheckpoint)
+class LedgerCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('product', 'location', 'quantity', 'as_of', 'owner')
+    list_select_related = ('product', 'location__warehouse', 'owner')
+    autocomplete_fields = ('product', 'location', 'owner')
+    readonly_fields = ('as_of',)
+    show_facets = admin.ShowFacets.NEVER
+
+@admin.register(TransactionArchive)
+class TransactionArchiveAdmin(admin.ModelAdmin):
+    # The compressed rows themselves are read through the ledger API
+    list_display = ('month', 'row_count', 'updated_at', 'owner')
+    list_select_related = ('owner',)
+    readonly_fields = ('month', 'row_count', 'totals', 'updated_at', 'owner')
+    show_facets = admin.ShowFacets.NEVER
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    # Derived data: maintained by order completion and rebuild_sales_rollups
+    list_display = ('month', 'product', 'category', 'units', 'revenue', 'cost', 'owner')
+    list_filter = ('month',)
+    list_select_related = ('product', 'category', 'owner')
+    autocomplete_fields = ('product', 'category', 'owner')
+    show_facets = admin.ShowFacets.NEVER
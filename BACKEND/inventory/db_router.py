@@ -0,0 +1,70 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Set by ReplicaReadMixin for the duration of a request that is allowed to read stale data
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_alias():
+    """ Returns the configured replica alias, or None when no replica is set up. """
+    alias = getattr(settings, 'REPLICA_DB_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+@contextmanager
+def replica_request_scope():
+    """ Confines allow_replica_reads() to a single request. """
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def allow_replica_reads():
+    _replica_reads.set(True)
+
+
+def _sticky_key(user_id):
+    return f"db-primary-sticky:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """
+    Called after a tenant writes. For the next few seconds all of their reads stay
+    on the primary so they never see their own change missing because of replica lag.
+    The pin is kept in the default cache, which settings require to be shared
+    between workers whenever a replica is configured.
+    """
+    cache.set(_sticky_key(user_id), True, getattr(settings, 'REPLICA_STICKY_SECONDS', 5))
+
+
+def is_pinned_to_primary(user_id):
+    return cache.get(_sticky_key(user_id), False)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica only while a request has opted in (see ReplicaReadMixin).
+    Everything else - writes, read-after-write paths, admin, management commands -
+    uses 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data, so objects loaded from either can be related
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema from the primary via replication
+        return db != replica_alias()
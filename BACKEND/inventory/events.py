@@ -0,0 +1,111 @@
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class BaseBroker:
+    """
+    Pub/sub used by the stock change feed. publish() is called from sync code
+    (model saves); subscribe() is used by the async SSE view.
+    """
+
+    def publish(self, owner_id, event):
+        raise NotImplementedError
+
+    def has_subscribers(self, owner_id):
+        # Backends that can't tell (e.g. a shared broker) should say yes
+        return True
+
+    def subscribe(self, owner_id):
+        """ Async context manager yielding an object with an awaitable get(). """
+        raise NotImplementedError
+
+
+class InProcessBroker(BaseBroker):
+    """
+    Delivers events to subscribers inside this process only. Enough when the API
+    and the feed are served by the same ASGI process; run several processes and
+    you need a shared backend configured through STOCK_EVENTS_BROKER.
+    """
+    queue_size = 1000
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, owner_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(owner_id, ()))
+        for loop, queue in subscribers:
+            # Saves run in worker threads, the queue belongs to the event loop
+            loop.call_soon_threadsafe(self._offer, queue, event)
+
+    def has_subscribers(self, owner_id):
+        return bool(self._subscribers.get(owner_id))
+
+    @asynccontextmanager
+    async def subscribe(self, owner_id):
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self._lock:
+            self._subscribers[owner_id].add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                self._subscribers[owner_id].discard(entry)
+                if not self._subscribers[owner_id]:
+                    del self._subscribers[owner_id]
+
+    @staticmethod
+    def _offer(queue, event):
+        if queue.full():
+            # The client fell too far behind to catch up from deltas
+            while not queue.empty():
+                queue.get_nowait()
+            event = {'type': 'resync'}
+        queue.put_nowait(event)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    path = getattr(settings, 'STOCK_EVENTS_BROKER', 'inventory.events.InProcessBroker')
+    return import_string(path)()
+
+
+def stock_changed(owner_id, stock_ids):
+    """
+    Announces new balances for the given Stock rows once the current transaction
+    commits, so subscribers never see a change that is later rolled back.
+    """
+    if not stock_ids or not get_broker().has_subscribers(owner_id):
+        return
+    stock_ids = list(stock_ids)
+    transaction.on_commit(lambda: _publish_balances(owner_id, stock_ids))
+
+
+def stock_deleted(owner_id, stock_id):
+    broker = get_broker()
+    if broker.has_subscribers(owner_id):
+        transaction.on_commit(lambda: broker.publish(owner_id, {'type': 'deleted', 'id': stock_id}))
+
+
+def _publish_balances(owner_id, stock_ids):
+    from .models import Stock
+
+    broker = get_broker()
+    rows = Stock.objects.filter(pk__in=stock_ids).values('id', 'product_id', 'location_id', 'batch_id', 'quantity')
+    for row in rows:
+        broker.publish(owner_id, {
+            'type': 'stock',
+            'id': row['id'],
+            'product': row['product_id'],
+            'location': row['location_id'],
+            'batch': row['batch_id'],
+            'quantity': str(row['quantity']),
+        })
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+
+def _ttl():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+
+def idempotent(view_method):
+    """
+    Honors the Idempotency-Key header on a POST view/action. The first response
+    for a key is stored and replayed for every retry with the same key, so a
+    client retrying over a flaky connection can't post stock twice.
+    Requests without the header behave exactly as before.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response({'error': f'{HEADER} must be at most 255 characters.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = f"{request.method} {request.path}"[:255]
+        now = timezone.now()
+
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    owner=request.user, key=key, request_fingerprint=fingerprint, expires_at=now + _ttl()
+                )
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(owner=request.user, key=key).first()
+            if record is None or record.expires_at <= now:
+                # Expired (or evicted between our insert and read): treat as a fresh key
+                IdempotencyKey.objects.filter(owner=request.user, key=key, expires_at__lte=now).delete()
+                return wrapper(self, request, *args, **kwargs)
+            return _replay(record, fingerprint)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            # Nothing was committed on our behalf; let the client retry for real
+            record.delete()
+            raise
+
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            record.response_status = response.status_code
+            record.response_body = response.data
+            record.save(update_fields=['response_status', 'response_body'])
+        return response
+
+    return wrapper
+
+
+def _replay(record, fingerprint):
+    if record.request_fingerprint != fingerprint:
+        return Response(
+            {'error': f'This {HEADER} was already used for a different request.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+
+    if record.response_status is None:
+        return Response(
+            {'error': f'A request with this {HEADER} is still being processed.'},
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def purge_expired(batch_size=5000):
+    """ Deletes expired keys in batches so the table stays small. Returns the number removed. """
+    removed = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return removed
+        removed += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
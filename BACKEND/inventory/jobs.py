@@ -0,0 +1,192 @@
+import traceback
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, F
+from django.utils import timezone
+
+from .models import Job, Order, Location, Stock, InventoryTransaction, TransferOrder, CycleCount, LedgerCheckpoint, Supplier
+
+# job_type -> callable(job) returning a JSON-serializable result
+JOB_HANDLERS = {}
+
+
+def job_handler(job_type):
+    def register(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return register
+
+
+# --- QUEUE API ---
+
+def enqueue(owner, job_type, payload=None, dedupe_key=None):
+    """
+    Queues a job for the run_jobs worker. With a dedupe_key, enqueueing the same
+    work twice returns the job that already exists; a FAILED job is re-armed.
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type '{job_type}'")
+
+    if not dedupe_key:
+        return Job.objects.create(owner=owner, job_type=job_type, payload=payload or {})
+
+    try:
+        with transaction.atomic():
+            job, _ = Job.objects.get_or_create(
+                owner=owner, dedupe_key=dedupe_key,
+                defaults={'job_type': job_type, 'payload': payload or {}},
+            )
+    except IntegrityError:
+        # Lost the race against a concurrent enqueue of the same key
+        job = Job.objects.get(owner=owner, dedupe_key=dedupe_key)
+
+    if job.status == 'FAILED':
+        job.status = 'PENDING'
+        job.attempts = 0
+        job.error = ''
+        job.run_after = timezone.now()
+        job.save(update_fields=['status', 'attempts', 'error', 'run_after'])
+    return job
+
+
+def requeue_stale(running_for=timedelta(minutes=30)):
+    """ Puts back jobs whose worker died mid-run. """
+    cutoff = timezone.now() - running_for
+    return Job.objects.filter(status='RUNNING', started_at__lt=cutoff).update(status='PENDING')
+
+
+def claim_jobs(limit):
+    """
+    Marks up to `limit` due jobs as RUNNING and returns their ids. At most one job
+    per owner is claimed per call, and none for an owner with a job still
+    running, so a tenant with a deep backlog can't starve the others and each
+    tenant's jobs still run in order.
+    """
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status='PENDING', run_after__lte=now)
+        .exclude(owner__in=Job.objects.filter(status='RUNNING').values('owner'))
+        .order_by('created_at')
+        .values_list('id', 'owner_id')[:limit * 10]
+    )
+
+    claimed, owners = [], set()
+    for job_id, owner_id in candidates:
+        if owner_id in owners:
+            continue
+        # Conditional UPDATE: only one worker can flip a given row from PENDING
+        won = Job.objects.filter(pk=job_id, status='PENDING').update(
+            status='RUNNING', started_at=now, attempts=F('attempts') + 1
+        )
+        if won:
+            claimed.append(job_id)
+            owners.add(owner_id)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def run_job(job_id):
+    """ Executes one claimed job. Runs inside a run_jobs pool process. """
+    job = Job.objects.select_related('owner').get(pk=job_id)
+    handler = JOB_HANDLERS.get(job.job_type)
+
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job type '{job.job_type}'")
+        job.result = handler(job)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            # Back off 30s, 60s, 120s... before the next attempt
+            job.status = 'PENDING'
+            job.run_after = timezone.now() + timedelta(seconds=30 * 2 ** (job.attempts - 1))
+        else:
+            job.status = 'FAILED'
+            job.finished_at = timezone.now()
+    else:
+        job.status = 'DONE'
+        job.error = ''
+        job.finished_at = timezone.now()
+
+    job.save(update_fields=['status', 'result', 'error', 'run_after', 'finished_at'])
+    return job.status
+
+
+# --- HANDLERS ---
+# Handlers may run more than once (retries, stale requeue), so each must be idempotent.
+
+@job_handler('complete_order')
+def complete_order(job):
+    order = Order.objects.get(pk=job.payload['order_id'], owner=job.owner)
+    location = Location.objects.get(pk=job.payload['location_id'], warehouse__owner=job.owner)
+    processed = order.complete(location)
+    return {'order_id': order.id, 'already_completed': not processed}
+
+
+@job_handler('execute_transfer')
+def execute_transfer(job):
+    transfer = TransferOrder.objects.get(pk=job.payload['transfer_id'], owner=job.owner)
+    processed = transfer.execute()
+    return {'transfer_id': transfer.id, 'already_completed': not processed}
+
+
+@job_handler('post_cycle_count')
+def post_cycle_count(job):
+    count = CycleCount.objects.get(pk=job.payload['count_id'], owner=job.owner)
+    summary = count.post(uncounted_as_zero=job.payload.get('uncounted_as_zero', False))
+    return {'count_id': count.id, 'already_posted': summary is None, **(summary or {})}
+
+
+@job_handler('refresh_lead_times')
+def refresh_lead_times(job):
+    return {'suppliers': Supplier.refresh_lead_times(owner_id=job.owner_id)}
+
+
+@job_handler('reconcile_stock')
+def reconcile_stock(job):
+    """ Compares Stock balances with the totals implied by the transaction ledger. """
+    # Archived transactions count through their checkpoints
+    balances = {
+        (product_id, location_id): quantity
+        for product_id, location_id, quantity in LedgerCheckpoint.objects.filter(owner=job.owner)
+        .values_list('product_id', 'location_id', 'quantity')
+    }
+    incoming = (
+        InventoryTransaction.objects.filter(owner=job.owner, destination_location__isnull=False)
+        .values('product_id', 'destination_location_id')
+        .annotate(total=Sum('quantity'))
+    )
+    for row in incoming:
+        key = (row['product_id'], row['destination_location_id'])
+        balances[key] = balances.get(key, 0) + row['total']
+
+    outgoing = (
+        InventoryTransaction.objects.filter(owner=job.owner, source_location__isnull=False)
+        .values('product_id', 'source_location_id')
+        .annotate(total=Sum('quantity'))
+    )
+    for row in outgoing:
+        key = (row['product_id'], row['source_location_id'])
+        balances[key] = balances.get(key, 0) - row['total']
+
+    on_hand = (
+        Stock.objects.filter(product__owner=job.owner)
+        .values('product_id', 'location_id')
+        .annotate(total=Sum('quantity'))
+    )
+    stock = {(row['product_id'], row['location_id']): row['total'] for row in on_hand}
+
+    mismatches = []
+    for key in balances.keys() | stock.keys():
+        expected, actual = balances.get(key, 0), stock.get(key, 0)
+        if expected != actual:
+            mismatches.append({
+                'product': key[0],
+                'location': key[1],
+                'ledger_quantity': str(expected),
+                'stock_quantity': str(actual),
+            })
+
+    return {'checked': len(balances.keys() | stock.keys()), 'mismatches': mismatches}
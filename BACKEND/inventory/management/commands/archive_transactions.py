@@ -0,0 +1,41 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory.models import InventoryTransaction, TransactionArchive
+
+
+class Command(BaseCommand):
+    """
+    Moves transactions older than TRANSACTION_ARCHIVE_AFTER_DAYS (rounded down
+    to a whole month) into the per-owner monthly archives, folding them into
+    the ledger checkpoints first. Safe to rerun; meant to run monthly from cron.
+    """
+    help = "Archive old inventory transactions out of the live ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.TRANSACTION_ARCHIVE_AFTER_DAYS,
+                            help="Archive months that ended more than this many days ago")
+        parser.add_argument('--owner', type=int, help="Only archive this owner's transactions (user id)")
+
+    def handle(self, *args, **options):
+        horizon = timezone.localdate() - timedelta(days=options['days'])
+        cutoff = timezone.make_aware(datetime.combine(horizon.replace(day=1), time.min))
+
+        if options['owner']:
+            owners = [options['owner']]
+        else:
+            owners = (
+                InventoryTransaction.objects.filter(created_at__lt=cutoff)
+                .values_list('owner_id', flat=True).distinct().order_by()
+            )
+
+        total = 0
+        for owner_id in list(owners):
+            archived = TransactionArchive.archive_before(owner_id, cutoff)
+            if archived:
+                self.stdout.write(f"Owner {owner_id}: archived {archived} transactions")
+            total += archived
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} transactions from before {cutoff:%Y-%m-%d}."))
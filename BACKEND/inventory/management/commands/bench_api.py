@@ -0,0 +1,206 @@
+import json
+import platform
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import SerialKey
+from inventory.seeding import seed_tenant
+
+User = get_user_model()
+
+API = '/api/inventory'
+
+
+class QueryMeter:
+    """
+    connection.execute_wrapper that counts queries and their time. Unlike
+    CaptureQueriesContext it has no 9000-query cap, which N+1 endpoints hit.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class Command(BaseCommand):
+    """
+    Seeds a synthetic tenant, then measures latency and query counts of the
+    inventory endpoints and of complete_order. Point it at a scratch database:
+
+        python manage.py bench_api --products 20000 --output bench.json
+        python manage.py bench_api --baseline bench.json --fail-on-regression
+
+    Query counts are exact and should not change between runs; latencies are
+    compared with --tolerance to absorb noise.
+    """
+    help = "Benchmark inventory API endpoints against a seeded tenant and write a JSON report."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--locations', type=int, default=50)
+        parser.add_argument('--transactions', type=int, default=20000)
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--items-per-order', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5, help="Timed calls per endpoint")
+        parser.add_argument('--output', help="Write the JSON report to this file")
+        parser.add_argument('--baseline', help="Compare against a report written by an earlier run")
+        parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed p50 slowdown vs. baseline (0.25 = 25%%)")
+        parser.add_argument('--fail-on-regression', action='store_true')
+        parser.add_argument('--keep', action='store_true', help="Don't delete the seeded tenant afterwards")
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        if options['orders'] < repeat:
+            raise CommandError("--orders must be at least --repeat (each complete_order call uses a fresh order)")
+
+        owner = User.objects.create_user(phone_number=f"bench{uuid.uuid4().hex[:8]}", password=None)
+        try:
+            now = timezone.now()
+            SerialKey.objects.create(
+                user=owner, allow_inventory=True, start_date=now - timedelta(days=1), end_date=now + timedelta(days=1)
+            )
+            started = time.perf_counter()
+            seeded = seed_tenant(
+                owner,
+                products=options['products'], locations=options['locations'],
+                transactions=options['transactions'], orders=options['orders'],
+                items_per_order=options['items_per_order'],
+            )
+            self.stdout.write(f"Seeded tenant in {time.perf_counter() - started:.1f}s")
+
+            # The test client calls itself 'testserver'; repeated runs would drain the tenant's bucket
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], TENANT_THROTTLE_ENABLED=False):
+                results = self._run(owner, seeded, repeat)
+        finally:
+            if not options['keep']:
+                owner.delete()
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'backend': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'repeat': repeat,
+                'size': {key: options[key] for key in ('products', 'locations', 'transactions', 'orders', 'items_per_order')},
+            },
+            'results': results,
+        }
+
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<22} p50 {row['p50_ms']:>9.1f}ms  p95 {row['p95_ms']:>9.1f}ms  "
+                f"db {row['db_ms']:>8.1f}ms  {row['queries']:>5} queries"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+        if options['baseline']:
+            regressions = self._compare(report, options['baseline'], options['tolerance'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}")
+
+    def _endpoints(self, seeded):
+        product_id = seeded['products'][0]
+        orders = iter(seeded['orders'])
+        location_id = seeded['locations'][0]
+        return {
+            'products.list': lambda: ('get', f'{API}/products/', None),
+            'products.detail': lambda: ('get', f'{API}/products/{product_id}/', None),
+            'products.low_stock': lambda: ('get', f'{API}/products/low_stock/', None),
+            'stock.list': lambda: ('get', f'{API}/stock/', None),
+            'orders.list': lambda: ('get', f'{API}/orders/', None),
+            'transactions.list': lambda: ('get', f'{API}/transactions/', None),
+            'transfers.list': lambda: ('get', f'{API}/transfers/', None),
+            'cycle_counts.list': lambda: ('get', f'{API}/cycle-counts/', None),
+            'jobs.list': lambda: ('get', f'{API}/jobs/', None),
+            'analytics.dashboard': lambda: ('get', f'{API}/analytics/dashboard_stats/', None),
+            'sync.snapshot': lambda: ('get', f'{API}/sync/', None),
+            # Every call completes a different order; repeating one would hit the already-completed path
+            'orders.complete_order': lambda: (
+                'post', f'{API}/orders/{next(orders)}/complete_order/', {'location_id': location_id}
+            ),
+        }
+
+    def _run(self, owner, seeded, repeat):
+        client = APIClient()
+        client.force_authenticate(owner)
+        results = {}
+
+        for name, build in self._endpoints(seeded).items():
+            if not name.endswith('complete_order'):
+                # Warm-up call: fills caches and the connection so they don't skew the first sample
+                method, path, data = build()
+                getattr(client, method)(path, data, format='json')
+
+            timings, db_times, queries = [], [], None
+            for _ in range(repeat):
+                method, path, data = build()
+                meter = QueryMeter()
+                with connection.execute_wrapper(meter):
+                    started = time.perf_counter()
+                    response = getattr(client, method)(path, data, format='json')
+                    timings.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    raise CommandError(f"{name}: {method.upper()} {path} returned {response.status_code}")
+                db_times.append(meter.seconds)
+                queries = meter.count
+
+            timings.sort()
+            results[name] = {
+                'p50_ms': round(statistics.median(timings) * 1000, 2),
+                'p95_ms': round(timings[max(int(len(timings) * 0.95) - 1, 0)] * 1000, 2),
+                'mean_ms': round(statistics.fmean(timings) * 1000, 2),
+                'db_ms': round(statistics.median(db_times) * 1000, 2),
+                'queries': queries,
+            }
+        return results
+
+    def _compare(self, report, baseline_path, tolerance):
+        with open(baseline_path) as fh:
+            baseline = json.load(fh)
+
+        if baseline['meta'].get('size') != report['meta']['size']:
+            self.stdout.write(self.style.WARNING("Baseline was recorded with a different tenant size"))
+
+        regressions = []
+        for name, row in report['results'].items():
+            base = baseline['results'].get(name)
+            if base is None:
+                self.stdout.write(f"{name:<22} new endpoint, no baseline")
+                continue
+            ratio = row['p50_ms'] / base['p50_ms'] if base['p50_ms'] else 1.0
+            problems = []
+            if ratio > 1 + tolerance:
+                problems.append(f"p50 {base['p50_ms']}ms -> {row['p50_ms']}ms ({ratio:.2f}x)")
+            if row['queries'] > base['queries']:
+                problems.append(f"queries {base['queries']} -> {row['queries']}")
+
+            if problems:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f"{name:<22} REGRESSION: {'; '.join(problems)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name:<22} ok ({ratio:.2f}x)"))
+        return regressions
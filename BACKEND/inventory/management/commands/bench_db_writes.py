@@ -0,0 +1,93 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction, OperationalError
+
+from inventory.models import Product, Warehouse, Location, InventoryTransaction
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Measures concurrent InventoryTransaction write throughput against whichever
+    database is configured. Run it once per backend to compare, e.g.:
+
+        python manage.py bench_db_writes
+        DB_ENGINE=postgres DB_NAME=bench python manage.py bench_db_writes
+
+    Each worker thread writes as its own tenant, so the numbers show how much
+    the backend serializes writes that don't actually conflict.
+    """
+    help = "Benchmark concurrent stock-moving writes on the configured database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Concurrent writer threads (one tenant each)")
+        parser.add_argument('--writes', type=int, default=200, help="Transactions written per worker")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        writes = options['writes']
+        run_id = uuid.uuid4().hex[:6]
+
+        tenants = [self._create_tenant(f"bench{run_id}{i}") for i in range(workers)]
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lambda tenant: self._write_loop(tenant, writes), tenants))
+            elapsed = time.perf_counter() - started
+        finally:
+            User.objects.filter(phone_number__startswith=f"bench{run_id}").delete()
+
+        latencies = sorted(lat for lats, _ in results for lat in lats)
+        errors = sum(err for _, err in results)
+        committed = len(latencies)
+
+        self.stdout.write(f"Backend:     {connection.vendor}")
+        self.stdout.write(f"Workers:     {workers} x {writes} writes")
+        self.stdout.write(f"Committed:   {committed} ({errors} failed)")
+        self.stdout.write(f"Elapsed:     {elapsed:.2f}s")
+        if committed:
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(f"Latency:     p50 {statistics.median(latencies) * 1000:.1f}ms, p95 {p95 * 1000:.1f}ms")
+        self.stdout.write(self.style.SUCCESS(f"Throughput:  {committed / elapsed:.0f} tx/s"))
+
+    def _create_tenant(self, phone_number):
+        user = User.objects.create_user(phone_number=phone_number, password=None)
+        product = Product.objects.create(
+            owner=user, name="Bench Item", sku="BENCH-1", cost_price=1, selling_price=2
+        )
+        warehouse = Warehouse.objects.create(owner=user, name="Bench WH", address="-")
+        location = Location.objects.create(warehouse=warehouse, name="BIN-1")
+        return user, product, location
+
+    def _write_loop(self, tenant, writes):
+        user, product, location = tenant
+        latencies, errors = [], 0
+        try:
+            for _ in range(writes):
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        InventoryTransaction.objects.create(
+                            transaction_type='IN',
+                            owner=user,
+                            product=product,
+                            quantity=1,
+                            destination_location=location,
+                            reference="bench",
+                        )
+                except OperationalError:
+                    # "database is locked" on SQLite once the busy timeout runs out
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+        finally:
+            # Each thread owns its own connection; release it so the pool/file lock is freed
+            connection.close()
+        return latencies, errors
@@ -0,0 +1,77 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import ORJSONRenderer, MessagePackRenderer
+from inventory.models import Product, Stock
+from inventory.seeding import seed_tenant
+from inventory.serializers import ProductSerializer, StockSerializer
+from inventory.views import ProductViewSet, StockViewSet
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Compares the product and stock list paths on a large tenant: ModelSerializer
+    + DRF's JSONRenderer (the old path, given select_related so it isn't an N+1
+    comparison) against the values() fast path rendered with orjson and
+    MessagePack. Queries are included in every timing.
+
+        python manage.py bench_list_rendering --rows 50000
+    """
+    help = "Benchmark serializer vs. values() list building and JSON/MessagePack rendering."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50_000, help="Products, and stock rows")
+        parser.add_argument('--repeat', type=int, default=3, help="Best of N runs is reported")
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        owner = User.objects.create_user(phone_number=f"bench{uuid.uuid4().hex[:8]}", password=None)
+        try:
+            seed_tenant(owner, products=rows, locations=1, transactions=rows, orders=0)
+            self.stdout.write(f"Seeded {rows} products, {Stock.objects.filter(product__owner=owner).count()} stock rows")
+
+            products = Product.objects.filter(owner=owner).order_by('pk')
+            stock = Stock.objects.filter(product__owner=owner).order_by('pk')
+            product_view, stock_view = ProductViewSet(), StockViewSet()
+
+            cases = [
+                ('products  serializer + json', lambda: JSONRenderer().render(
+                    ProductSerializer(products.select_related('owner', 'category').annotate(stock_total=Sum('stock__quantity')), many=True).data)),
+                ('products  values + orjson', lambda: ORJSONRenderer().render(
+                    product_view.build_rows(self._values(product_view, products.annotate(total_stock=Sum('stock__quantity')))))),
+                ('products  values + msgpack', lambda: MessagePackRenderer().render(
+                    product_view.build_rows(self._values(product_view, products.annotate(total_stock=Sum('stock__quantity')))))),
+                ('stock     serializer + json', lambda: JSONRenderer().render(
+                    StockSerializer(stock.select_related('location__warehouse'), many=True).data)),
+                ('stock     values + orjson', lambda: ORJSONRenderer().render(
+                    stock_view.build_rows(self._values(stock_view, stock)))),
+                ('stock     values + msgpack', lambda: MessagePackRenderer().render(
+                    stock_view.build_rows(self._values(stock_view, stock)))),
+            ]
+
+            baseline = None
+            for name, run in cases:
+                best, size = None, 0
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    size = len(run())
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                if name.endswith('serializer + json'):
+                    baseline = best
+                self.stdout.write(
+                    f"{name:<30} {best * 1000:>8.0f}ms  {size / 1024:>8.0f} KiB  {baseline / best:>5.1f}x"
+                )
+        finally:
+            owner.delete()
+
+    @staticmethod
+    def _values(view, queryset):
+        return queryset.values_list(*view.list_fields.values())
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from inventory.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    """ Evicts expired Idempotency-Key responses. Meant to run from cron, e.g. hourly. """
+    help = "Delete expired idempotency keys."
+
+    def handle(self, *args, **options):
+        removed = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} expired idempotency keys."))
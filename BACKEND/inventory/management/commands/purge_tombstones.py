@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory.models import Tombstone
+
+
+class Command(BaseCommand):
+    """ Drops delta sync tombstones past SYNC_TOMBSTONE_RETENTION_DAYS. Meant to run daily from cron. """
+    help = "Delete expired delta sync tombstones."
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        removed, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} tombstones."))
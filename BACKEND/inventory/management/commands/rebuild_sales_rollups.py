@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import Order, SalesRollup
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the monthly sales rollups from completed sales orders. Only
+    needed after fixing data by hand or restoring a backup; completing an
+    order keeps them current.
+    """
+    help = "Rebuild the monthly sales rollups, for every owner or just one."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', type=int, help="Only rebuild this owner's rollups (user id)")
+
+    def handle(self, *args, **options):
+        if options['owner']:
+            owners = [options['owner']]
+        else:
+            owners = Order.objects.filter(order_type='SO').values_list('owner_id', flat=True).distinct().order_by()
+
+        total = 0
+        for owner_id in owners:
+            total += SalesRollup.rebuild(owner_id)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} rollup rows."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from inventory.models import Supplier
+
+
+class Command(BaseCommand):
+    """
+    Recomputes every supplier's measured lead times (mean and p90) from
+    purchase order history with the same two grouped queries for all owners.
+    Meant to run nightly from cron; owners can also refresh their own through
+    POST /api/inventory/analytics/refresh_lead_times/.
+    """
+    help = "Recompute supplier lead-time statistics from completed purchase orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', type=int, help="Only refresh this owner's suppliers (user id)")
+
+    def handle(self, *args, **options):
+        updated = Supplier.refresh_lead_times(owner_id=options['owner'])
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} suppliers."))
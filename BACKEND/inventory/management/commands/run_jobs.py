@@ -0,0 +1,84 @@
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from inventory.jobs import claim_jobs, requeue_stale, run_job
+from inventory.management.pool import process_pool
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Processes queued inventory Jobs in a process pool, so tenants progress in
+    parallel without an external broker. Work is claimed whenever a process is
+    free, at most one job per tenant at a time, so a slow job only holds up its
+    own tenant.
+
+        python manage.py run_jobs --processes 4
+    """
+    help = "Run the background job worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 2, help="Pool size")
+        parser.add_argument('--poll', type=float, default=2.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit instead of polling forever")
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        while True:
+            with process_pool(processes) as pool:
+                if self._work(pool, processes, options):
+                    break
+            # A pool process died; start a fresh pool. Its jobs are still RUNNING
+            # and go back to the queue through requeue_stale()
+            logger.error("Job worker pool broke; restarting it")
+
+    def _work(self, pool, processes, options):
+        """ Feeds the pool until the queue is drained (--once), returning True, or until the pool breaks. """
+        running = {}  # future -> job id
+        while True:
+            free = processes - len(running)
+            if free:
+                requeue_stale()
+                try:
+                    for job_id in claim_jobs(limit=free):
+                        running[pool.submit(run_job, job_id)] = job_id
+                except BrokenProcessPool:
+                    return False
+                finally:
+                    # Release the connection between claims; SQLite in particular holds a lock otherwise
+                    connections.close_all()
+
+            if not running:
+                if options['once']:
+                    return True
+                time.sleep(options['poll'])
+                continue
+
+            # Wake when any job finishes so its process gets new work straight
+            # away; with idle processes, also look for new jobs every poll interval
+            idle = len(running) < processes
+            done, _ = wait(running, timeout=options['poll'] if idle else None, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                job_id = running.pop(future)
+                try:
+                    status = future.result()
+                except Exception as exc:
+                    # run_job couldn't record an outcome (a database error, or its process
+                    # died); the job stays RUNNING until requeue_stale() puts it back
+                    logger.exception("Job #%s raised in the worker", job_id)
+                    status = 'ERROR'
+                    broken = broken or isinstance(exc, BrokenProcessPool)
+                self.stdout.write(f"Job #{job_id}: {status}")
+            if broken:
+                for job_id in running.values():
+                    # Every other job of a broken pool fails the same way
+                    logger.error("Job #%s lost with the worker pool", job_id)
+                return False
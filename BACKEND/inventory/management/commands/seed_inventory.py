@@ -0,0 +1,123 @@
+import os
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from inventory.management.pool import process_pool
+
+
+def _seed_owner(owner_id, seed, options):
+    # Imported here so pool processes can unpickle this function before apps are ready
+    from django.contrib.auth import get_user_model
+    from inventory.seeding import CatalogSeeder
+
+    owner = get_user_model().objects.get(pk=owner_id)
+    started = time.perf_counter()
+    seeder = CatalogSeeder(owner, rng=random.Random(seed), chunk_size=options['chunk_size'])
+    written = seeder.run(
+        products=options['products'],
+        categories=options['categories'],
+        warehouses=options['warehouses'],
+        locations=options['locations'],
+        transactions=options['owner_transactions'],
+        days=options['days'],
+        kit_ratio=options['kit_ratio'],
+        batch_ratio=options['batch_ratio'],
+    )
+    return owner.phone_number, written, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    """
+    Generates load-testing tenants with bulk_create only. Transactions are
+    written in time order in chunks and Stock is derived from the resulting
+    ledger, so reconcile_stock reports no mismatches. E.g. 10M transactions:
+
+        python manage.py seed_inventory --owners 16 --products 20000 --transactions 10000000 --processes 8
+
+    Building the INSERTs is CPU-bound, so owners are seeded in parallel
+    processes. Owners log in as <prefix>-<n> with --password and get a licence
+    valid for a year.
+    """
+    help = "Seed synthetic owners with catalogs, warehouses, stock and transaction history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owners', type=int, default=1)
+        parser.add_argument('--products', type=int, default=5000, help="Per owner")
+        parser.add_argument('--categories', type=int, default=100, help="Per owner, spread over a 3-level tree")
+        parser.add_argument('--warehouses', type=int, default=2, help="Per owner")
+        parser.add_argument('--locations', type=int, default=200, help="Per warehouse")
+        parser.add_argument('--transactions', type=int, default=100_000, help="Total, split evenly across owners")
+        parser.add_argument('--days', type=int, default=365, help="How far back the history starts")
+        parser.add_argument('--kit-ratio', type=float, default=0.02)
+        parser.add_argument('--batch-ratio', type=float, default=0.1, help="Share of batch-tracked products")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 2, help="Owners seeded in parallel")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, for reproducible datasets")
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--password', default='seed-password')
+
+    def handle(self, *args, **options):
+        from django.contrib.auth import get_user_model
+
+        count = options['owners']
+        if count < 1:
+            raise CommandError("--owners must be at least 1")
+        phone_numbers = [f"{options['prefix']}-{n}" for n in range(count)]
+        if get_user_model().objects.filter(phone_number__in=phone_numbers).exists():
+            raise CommandError(f"Owners with prefix '{options['prefix']}' already exist; pick another --prefix")
+
+        started = time.perf_counter()
+        owner_ids = self._create_owners(phone_numbers, options['password'])
+        per_owner, remainder = divmod(options['transactions'], count)
+        jobs = [
+            (owner_id, options['seed'] + n, {**options, 'owner_transactions': per_owner + (1 if n < remainder else 0)})
+            for n, owner_id in enumerate(owner_ids)
+        ]
+
+        total = 0
+        processes = min(options['processes'], count)
+        if processes > 1:
+            # Children open their own connections; don't let them inherit ours
+            connections.close_all()
+            with process_pool(processes) as pool:
+                results = pool.map(_seed_owner, *zip(*jobs))
+                total = self._report(results)
+        else:
+            total = self._report(_seed_owner(*job) for job in jobs)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {count} owner(s), {total} transactions in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f}/s)"
+        ))
+
+    def _report(self, results):
+        total = 0
+        for phone_number, written, elapsed in results:
+            total += written
+            self.stdout.write(f"{phone_number}: {written} transactions in {elapsed:.1f}s")
+        return total
+
+    def _create_owners(self, phone_numbers, password):
+        from django.contrib.auth import get_user_model
+        from core.models import SerialKey
+
+        # Hash once: make_password per user would dominate the run for many owners
+        hashed = make_password(password)
+        now = timezone.now()
+        with transaction.atomic():
+            owners = get_user_model().objects.bulk_create(
+                [get_user_model()(phone_number=p, password=hashed) for p in phone_numbers]
+            )
+            keys = SerialKey.objects.issue_batch(
+                len(owners), start_date=now, end_date=now + timedelta(days=365), allow_inventory=True
+            )
+            for key, owner in zip(keys, owners):
+                key.user = owner
+            SerialKey.objects.bulk_update(keys, ['user'])
+        return [owner.pk for owner in owners]
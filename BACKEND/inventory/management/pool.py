@@ -0,0 +1,21 @@
+"""
+Process pools for the management commands that fan work out over several
+processes (run_jobs, seed_inventory).
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+
+def init_worker():
+    # Pool processes are spawned fresh, so Django has to be configured in each one
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'src.settings')
+    django.setup()
+
+
+def process_pool(processes):
+    # 'spawn' avoids children inheriting (and later closing) the parent's DB connection
+    context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=init_worker)
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='aisle',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='bay',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='capacity',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Units the bin holds; empty means no limit', max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='level',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='zone',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
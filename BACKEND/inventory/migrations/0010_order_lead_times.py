@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_order_timestamps(apps, schema_editor):
+    # Best available history: completed orders aren't edited after completing, so
+    # their last update is the completion; confirmation is taken as creation
+    Order = apps.get_model('inventory', 'Order')
+    Order.objects.filter(status='COMPLETED').update(completed_at=models.F('updated_at'))
+    Order.objects.filter(status__in=['CONFIRMED', 'COMPLETED']).update(confirmed_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_location_coordinates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='confirmed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='lead_time_mean_days',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='lead_time_p90_days',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='lead_time_samples',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='lead_time_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['supplier', 'completed_at'], name='inventory_o_supplie_7038f1_idx'),
+        ),
+        migrations.RunPython(backfill_order_timestamps, migrations.RunPython.noop),
+    ]
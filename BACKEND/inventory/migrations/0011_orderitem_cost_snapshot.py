@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-19 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_snapshots(apps, schema_editor):
+    # History wasn't kept, so lines completed before this take the product as it is now
+    OrderItem = apps.get_model('inventory', 'OrderItem')
+    Product = apps.get_model('inventory', 'Product')
+    product = Product.objects.filter(pk=models.OuterRef('product_id'))
+    OrderItem.objects.filter(order__status='COMPLETED').update(
+        unit_cost=models.Subquery(product.values('cost_price')[:1]),
+        category_id=models.Subquery(product.values('category_id')[:1]),
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_order_lead_times'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.category'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
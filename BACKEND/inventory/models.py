@@ -1,7 +1,15 @@
-from django.db import models
+import zlib
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import msgpack
+from django.db import models, transaction
 from django.conf import settings
+from django.db.models.functions import Ceil, Coalesce, RowNumber, TruncMonth
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from .events import stock_changed, stock_deleted
 
 # --- ABSTRACT MODEL FOR DATA ISOLATION ---
 class UserOwnedModel(models.Model):
@@ -18,10 +26,12 @@ class UserOwnedModel(models.Model):
 class Category(UserOwnedModel):
     name = models.CharField(max_length=100)
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name_plural = "Categories"
         unique_together = ('name', 'owner') # Unique per user
+        indexes = [models.Index(fields=['owner', 'updated_at'])] # Delta sync
 
     def __str__(self):
         return self.name
@@ -32,9 +42,72 @@ class Supplier(UserOwnedModel):
     phone = models.CharField(max_length=50)
     lead_time_days = models.IntegerField(default=7, help_text="Average days to deliver")
 
+    # Measured from completed purchase orders by refresh_lead_times()
+    lead_time_samples = models.PositiveIntegerField(default=0)
+    lead_time_mean_days = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    lead_time_p90_days = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    lead_time_updated_at = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def refresh_lead_times(cls, owner_id=None, chunk_size=1000):
+        """
+        Recomputes the measured lead times (confirmed -> completed, or created ->
+        completed for orders completed straight from draft) of every supplier,
+        or one owner's, from purchase orders completed within
+        SUPPLIER_LEAD_TIME_WINDOW_DAYS. Two grouped queries however many
+        orders there are: count and total per supplier, then the 90th
+        percentile row per supplier (nearest rank) picked with window
+        functions. Returns the number of suppliers updated.
+        """
+        now = timezone.now()
+        placed = Coalesce('confirmed_at', 'created_at')
+        lead = models.ExpressionWrapper(models.F('completed_at') - placed, output_field=models.DurationField())
+        orders = Order.objects.filter(
+            order_type='PO', status='COMPLETED', supplier__isnull=False, completed_at__isnull=False,
+            completed_at__gte=now - timedelta(days=settings.SUPPLIER_LEAD_TIME_WINDOW_DAYS),
+        )
+        suppliers = cls.objects.all()
+        if owner_id is not None:
+            orders = orders.filter(owner_id=owner_id)
+            suppliers = suppliers.filter(owner_id=owner_id)
+
+        # Sum / count rather than Avg: averaging durations isn't portable across backends
+        totals = {
+            row['supplier_id']: (row['samples'], row['total'])
+            for row in orders.values('supplier_id').annotate(samples=models.Count('id'), total=models.Sum(lead)).order_by()
+        }
+        p90 = dict(
+            orders.annotate(
+                lead=lead,
+                position=models.Window(RowNumber(), partition_by=models.F('supplier_id'), order_by=[lead.asc(), models.F('id').asc()]),
+                samples=models.Window(models.Count('id'), partition_by=models.F('supplier_id')),
+            )
+            .filter(position=Ceil(models.F('samples') * 0.9))
+            .values_list('supplier_id', 'lead')
+        )
+
+        def days(duration):
+            return (Decimal(duration.total_seconds()) / 86400).quantize(Decimal('0.01'))
+
+        updated = 0
+        batch = []
+        for supplier in suppliers.only('id').iterator(chunk_size=chunk_size):
+            samples, total = totals.get(supplier.pk, (0, None))
+            supplier.lead_time_samples = samples
+            supplier.lead_time_mean_days = days(total / samples) if samples else None
+            supplier.lead_time_p90_days = days(p90[supplier.pk]) if supplier.pk in p90 else None
+            supplier.lead_time_updated_at = now
+            batch.append(supplier)
+            if len(batch) == chunk_size:
+                updated += cls.objects.bulk_update(batch, ['lead_time_samples', 'lead_time_mean_days', 'lead_time_p90_days', 'lead_time_updated_at'])
+                batch = []
+        if batch:
+            updated += cls.objects.bulk_update(batch, ['lead_time_samples', 'lead_time_mean_days', 'lead_time_p90_days', 'lead_time_updated_at'])
+        return updated
+
 class Product(UserOwnedModel):
     ABC_CHOICES = [('A', 'A - High Value'), ('B', 'B - Medium'), ('C', 'C - Low')]
 
@@ -61,9 +134,11 @@ class Product(UserOwnedModel):
     is_kit = models.BooleanField(default=False, help_text="Is this a bundle of other items?")
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('sku', 'owner') # Unique per user
+        indexes = [models.Index(fields=['owner', 'updated_at'])] # Delta sync
 
     def __str__(self):
         return f"{self.sku} - {self.name}"
@@ -86,6 +161,15 @@ class Location(models.Model):
     """ Specific Bin, Aisle, or Shelf inside a Warehouse """
     warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE)
     name = models.CharField(max_length=50, help_text="e.g., Aisle-1-Bin-A")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Where the bin is, for pick routes and putaway (see inventory/picking.py).
+    # Aisles and bays count up from the dock; locations without them are visited last.
+    zone = models.CharField(max_length=20, blank=True)
+    aisle = models.PositiveSmallIntegerField(null=True, blank=True)
+    bay = models.PositiveSmallIntegerField(null=True, blank=True)
+    level = models.PositiveSmallIntegerField(null=True, blank=True)
+    capacity = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, help_text="Units the bin holds; empty means no limit")
     
     def __str__(self):
         return f"{self.warehouse.name} - {self.name}"
@@ -107,10 +191,25 @@ class Stock(models.Model):
     batch = models.ForeignKey(Batch, null=True, blank=True, on_delete=models.SET_NULL)
     
     quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    # auto_now doesn't fire for queryset.update(), so balance updates set it explicitly
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         unique_together = ('product', 'location', 'batch')
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        # An empty row created by get_or_create isn't a balance change worth announcing
+        if not adding or self.quantity:
+            stock_changed(self.product.owner_id, [self.pk])
+
+    def delete(self, *args, **kwargs):
+        owner_id, stock_id = self.product.owner_id, self.pk
+        result = super().delete(*args, **kwargs)
+        stock_deleted(owner_id, stock_id)
+        return result
+
     def __str__(self):
         return f"{self.product.name} ({self.quantity}) @ {self.location}"
 
@@ -134,20 +233,36 @@ class InventoryTransaction(UserOwnedModel):
     reference = models.CharField(max_length=100, blank=True, help_text="PO #, SO #, or Reason")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['owner', 'created_at'])] # Ledger listing, archiving
+
     def save(self, *args, **kwargs):
-        # AUTOMATED STOCK UPDATE LOGIC
-        if not self.pk: # Only on create
+        if self.pk:
+            return super().save(*args, **kwargs)
+
+        # AUTOMATED STOCK UPDATE LOGIC (only on create)
+        # The ledger row and both balance changes commit together. Balances are
+        # changed with UPDATE ... SET quantity = quantity +/- n so concurrent
+        # movements of the same product can't overwrite each other.
+        with transaction.atomic():
+            changed = []
             if self.source_location:
                 src_stock, _ = Stock.objects.get_or_create(product=self.product, location=self.source_location)
-                src_stock.quantity -= self.quantity
-                src_stock.save()
-            
+                Stock.objects.filter(pk=src_stock.pk).update(
+                    quantity=models.F('quantity') - self.quantity, updated_at=timezone.now()
+                )
+                changed.append(src_stock.pk)
+
             if self.destination_location:
                 dest_stock, _ = Stock.objects.get_or_create(product=self.product, location=self.destination_location)
-                dest_stock.quantity += self.quantity
-                dest_stock.save()
-                
-        super().save(*args, **kwargs)
+                Stock.objects.filter(pk=dest_stock.pk).update(
+                    quantity=models.F('quantity') + self.quantity, updated_at=timezone.now()
+                )
+                changed.append(dest_stock.pk)
+
+            super().save(*args, **kwargs)
+            # Live dashboards (stock change feed) get the new balances after commit
+            stock_changed(self.owner_id, changed)
 
 # --- 5. PURCHASING & SALES ---
 class Order(UserOwnedModel):
@@ -162,13 +277,640 @@ class Order(UserOwnedModel):
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when the order first becomes CONFIRMED. PO lead times run from here (or from
+    # created_at when an order was completed straight from draft) to completed_at
+    confirmed_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'updated_at']), # Delta sync
+            models.Index(fields=['supplier', 'completed_at']), # Supplier lead times
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.status == 'CONFIRMED' and self.confirmed_at is None:
+            self.confirmed_at = timezone.now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'confirmed_at'}
+        super().save(*args, **kwargs)
+
+    def complete(self, location):
+        """
+        Posts a stock transaction for every line and marks the order COMPLETED.
+        Returns False if the order was already completed, so a retried request or
+        job never moves stock twice.
+        """
+        with transaction.atomic():
+            # Lock the row so two workers completing the same order serialize here
+            order = Order.objects.select_for_update().get(pk=self.pk)
+            if order.status == 'COMPLETED':
+                return False
+
+            tx_type = 'IN' if order.order_type == 'PO' else 'OUT'
+            items = list(order.items.select_related('product'))
+            for item in items:
+                # Create Transaction (stamped with owner)
+                InventoryTransaction.objects.create(
+                    transaction_type=tx_type,
+                    owner=order.owner,
+                    product=item.product,
+                    quantity=item.quantity,
+                    source_location=None if tx_type == 'IN' else location,
+                    destination_location=location if tx_type == 'IN' else None,
+                    reference=f"Order #{order.id}"
+                )
+
+            # What the goods cost and how they were categorised at the time, so
+            # sales reports don't restate history when products are edited
+            for item in items:
+                item.unit_cost, item.category_id = item.product.cost_price, item.product.category_id
+            OrderItem.objects.bulk_update(items, ['unit_cost', 'category'])
+
+            order.status = 'COMPLETED'
+            order.completed_at = timezone.now()
+            order.save()
+
+            if order.order_type == 'SO':
+                SalesRollup.add_order(order, items)
+
+        self.status, self.completed_at = order.status, order.completed_at
+        return True
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Snapshots of the product, taken when the order completes
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    category = models.ForeignKey(Category, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
 
     @property
     def total_price(self):
-        return self.quantity * self.unit_price
\ No newline at end of file
+        return self.quantity * self.unit_price
+
+# --- 6. BACKGROUND JOBS ---
+class Job(UserOwnedModel):
+    """ Heavy work queued by a request and executed by the run_jobs worker command. """
+    STATUS_CHOICES = [('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')]
+
+    job_type = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    payload = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    dedupe_key = models.CharField(max_length=100, null=True, blank=True, help_text="Enqueueing the same key again returns this job")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now, help_text="Not picked up before this time (retry backoff)")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('owner', 'dedupe_key')
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f"{self.job_type} #{self.pk} ({self.status})"
+
+
+# --- 7. REQUEST IDEMPOTENCY ---
+class IdempotencyKey(UserOwnedModel):
+    """ The stored response for a POST sent with an Idempotency-Key header (see inventory/idempotency.py). """
+    key = models.CharField(max_length=255)
+    request_fingerprint = models.CharField(max_length=255, help_text="Method and path the key was first used with")
+
+    # Both stay empty while the first request is still being processed
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('owner', 'key')
+
+    def __str__(self):
+        return f"{self.key} ({self.request_fingerprint})"
+
+
+# --- 8. DELTA SYNC ---
+class Tombstone(UserOwnedModel):
+    """ Remembers a deleted row so offline clients syncing from a cursor can drop it too. """
+    model_name = models.CharField(max_length=50)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['owner', 'deleted_at'])]
+
+
+# --- 9. STOCK TRANSFERS ---
+class TransferOrder(UserOwnedModel):
+    """ Moves many products from one location to another as a single document. """
+    STATUS_CHOICES = [('DRAFT', 'Draft'), ('COMPLETED', 'Completed')]
+
+    source_location = models.ForeignKey(Location, related_name='transfers_out', on_delete=models.PROTECT)
+    destination_location = models.ForeignKey(Location, related_name='transfers_in', on_delete=models.PROTECT)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DRAFT')
+    reference = models.CharField(max_length=100, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Transfer #{self.pk} ({self.status})"
+
+    def execute(self):
+        """
+        Applies every line as one atomic bulk operation: availability is checked
+        with a single query over the locked source rows, balances are written with
+        bulk_update/bulk_create and the MOVE ledger entries with bulk_create.
+        Only un-batched stock is moved. Raises ValidationError listing every short
+        line; returns False if the transfer was already completed.
+        """
+        with transaction.atomic():
+            transfer = TransferOrder.objects.select_for_update().get(pk=self.pk)
+            if transfer.status == 'COMPLETED':
+                return False
+
+            # Duplicate lines for one product are moved together
+            needed = {}
+            for line in transfer.lines.all():
+                needed[line.product_id] = needed.get(line.product_id, 0) + line.quantity
+
+            now = timezone.now()
+            source = {
+                s.product_id: s for s in Stock.objects.select_for_update().filter(
+                    location_id=transfer.source_location_id, product_id__in=needed, batch__isnull=True
+                )
+            }
+            short = [
+                f"Product {product_id}: {source[product_id].quantity if product_id in source else 0} available, {quantity} requested"
+                for product_id, quantity in needed.items()
+                if product_id not in source or source[product_id].quantity < quantity
+            ]
+            if short:
+                raise ValidationError({'insufficient_stock': short})
+
+            for product_id, quantity in needed.items():
+                source[product_id].quantity -= quantity
+                source[product_id].updated_at = now
+
+            destination = {
+                s.product_id: s for s in Stock.objects.select_for_update().filter(
+                    location_id=transfer.destination_location_id, product_id__in=needed, batch__isnull=True
+                )
+            }
+            new_rows = []
+            for product_id, quantity in needed.items():
+                if product_id in destination:
+                    destination[product_id].quantity += quantity
+                    destination[product_id].updated_at = now
+                else:
+                    new_rows.append(Stock(
+                        product_id=product_id, location_id=transfer.destination_location_id, quantity=quantity
+                    ))
+
+            Stock.objects.bulk_update(
+                list(source.values()) + list(destination.values()), ['quantity', 'updated_at'], batch_size=500
+            )
+            Stock.objects.bulk_create(new_rows, batch_size=500)
+
+            InventoryTransaction.objects.bulk_create([
+                InventoryTransaction(
+                    owner_id=transfer.owner_id,
+                    transaction_type='MOVE',
+                    product_id=product_id,
+                    quantity=quantity,
+                    source_location_id=transfer.source_location_id,
+                    destination_location_id=transfer.destination_location_id,
+                    reference=transfer.reference or f"Transfer #{transfer.pk}",
+                )
+                for product_id, quantity in needed.items()
+            ], batch_size=500)
+
+            transfer.status = 'COMPLETED'
+            transfer.completed_at = now
+            transfer.save(update_fields=['status', 'completed_at'])
+
+            # bulk writes skip Stock.save, so announce the new balances here
+            changed = [s.pk for s in source.values()] + [s.pk for s in destination.values()] + [s.pk for s in new_rows]
+            stock_changed(transfer.owner_id, changed)
+
+        self.status, self.completed_at = transfer.status, transfer.completed_at
+        return True
+
+class TransferLine(models.Model):
+    transfer = models.ForeignKey(TransferOrder, related_name='lines', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+# --- 10. CYCLE COUNTS ---
+class CycleCount(UserOwnedModel):
+    """
+    A stock count of one location or a whole warehouse. Opening it snapshots the
+    expected quantities; counted quantities are entered in bulk and post() writes
+    every variance as ADJ transactions plus Stock corrections in one go.
+    """
+    STATUS_CHOICES = [('OPEN', 'Open'), ('POSTED', 'Posted'), ('CANCELLED', 'Cancelled')]
+
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE)
+    location = models.ForeignKey(Location, null=True, blank=True, on_delete=models.CASCADE, help_text="Leave empty to count the whole warehouse")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='OPEN')
+    reference = models.CharField(max_length=100, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    posted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Count #{self.pk} ({self.status})"
+
+    def take_snapshot(self):
+        """ Records the current quantity of every stock row in scope, in one read and one bulk insert. """
+        stock = Stock.objects.filter(location__warehouse_id=self.warehouse_id)
+        if self.location_id:
+            stock = stock.filter(location_id=self.location_id)
+
+        CycleCountLine.objects.bulk_create([
+            CycleCountLine(
+                count=self,
+                product_id=row['product_id'],
+                location_id=row['location_id'],
+                batch_id=row['batch_id'],
+                expected_quantity=row['quantity'],
+            )
+            for row in stock.values('product_id', 'location_id', 'batch_id', 'quantity').iterator()
+        ], batch_size=1000)
+
+    def record_counts(self, entries):
+        """
+        Stores counted quantities from dicts of product, location, batch and counted.
+        Items found that weren't in the snapshot get a new line expecting zero.
+        Returns (updated, added).
+        """
+        keys = {}
+        for entry in entries:
+            location_id = entry.get('location') or self.location_id
+            if location_id is None:
+                raise ValidationError({'location': ["Required when counting a whole warehouse."]})
+            # A later entry for the same slot wins, as with a rescan
+            keys[(entry['product'], location_id, entry.get('batch'))] = entry['counted']
+
+        existing = {
+            (row['product_id'], row['location_id'], row['batch_id']): row['id']
+            for row in self.lines.values('id', 'product_id', 'location_id', 'batch_id').iterator()
+        }
+        updated = [CycleCountLine(id=existing[key], counted_quantity=qty) for key, qty in keys.items() if key in existing]
+        new = {key: qty for key, qty in keys.items() if key not in existing}
+
+        if new:
+            # Set-wise checks that the found items and their slots belong to this count
+            product_ids = {key[0] for key in new}
+            owned = set(Product.objects.filter(owner_id=self.owner_id, id__in=product_ids).values_list('id', flat=True))
+            if product_ids - owned:
+                raise ValidationError({'product': ["Invalid product or access denied."]})
+
+            locations = Location.objects.filter(warehouse_id=self.warehouse_id, id__in={key[1] for key in new})
+            if self.location_id:
+                locations = locations.filter(id=self.location_id)
+            if {key[1] for key in new} - set(locations.values_list('id', flat=True)):
+                raise ValidationError({'location': ["Location is outside the scope of this count."]})
+
+            batch_ids = {key[2] for key in new if key[2] is not None}
+            batches = set(Batch.objects.filter(id__in=batch_ids).values_list('id', 'product_id'))
+            if {(key[2], key[0]) for key in new if key[2] is not None} - batches:
+                raise ValidationError({'batch': ["Batch does not belong to the product."]})
+
+        with transaction.atomic():
+            CycleCountLine.objects.bulk_update(updated, ['counted_quantity'], batch_size=1000)
+            CycleCountLine.objects.bulk_create([
+                CycleCountLine(count=self, product_id=key[0], location_id=key[1], batch_id=key[2], counted_quantity=qty)
+                for key, qty in new.items()
+            ], batch_size=1000)
+        return len(updated), len(new)
+
+    def post(self, uncounted_as_zero=False):
+        """
+        Applies counted - expected to each counted line's Stock row, so movements
+        made after the snapshot are kept. Lines never counted are skipped unless
+        uncounted_as_zero. Returns a summary, or None if the count isn't OPEN.
+        """
+        with transaction.atomic():
+            count = CycleCount.objects.select_for_update().get(pk=self.pk)
+            if count.status != 'OPEN':
+                return None
+
+            variances = {}
+            for line in count.lines.all().iterator():
+                counted = line.counted_quantity
+                if counted is None:
+                    if not uncounted_as_zero:
+                        continue
+                    counted = 0
+                variance = counted - line.expected_quantity
+                if variance:
+                    key = (line.product_id, line.location_id, line.batch_id)
+                    variances[key] = variances.get(key, 0) + variance
+
+            now = timezone.now()
+            stock = {}
+            if variances:
+                locked = Stock.objects.select_for_update().filter(
+                    product_id__in={k[0] for k in variances}, location_id__in={k[1] for k in variances}
+                )
+                stock = {(s.product_id, s.location_id, s.batch_id): s for s in locked}
+
+            updated, created = [], []
+            for key, variance in variances.items():
+                if key in stock:
+                    stock[key].quantity += variance
+                    stock[key].updated_at = now
+                    updated.append(stock[key])
+                else:
+                    # Found an item the system didn't know was here
+                    created.append(Stock(product_id=key[0], location_id=key[1], batch_id=key[2], quantity=variance))
+
+            Stock.objects.bulk_update(updated, ['quantity', 'updated_at'], batch_size=1000)
+            Stock.objects.bulk_create(created, batch_size=1000)
+
+            reference = count.reference or f"Count #{count.pk}"
+            InventoryTransaction.objects.bulk_create([
+                InventoryTransaction(
+                    owner_id=count.owner_id,
+                    transaction_type='ADJ',
+                    product_id=product_id,
+                    quantity=abs(variance),
+                    # Same convention as save(): positive quantity out of source, into destination
+                    source_location_id=location_id if variance < 0 else None,
+                    destination_location_id=location_id if variance > 0 else None,
+                    reference=reference,
+                )
+                for (product_id, location_id, _), variance in variances.items()
+            ], batch_size=1000)
+
+            count.status = 'POSTED'
+            count.posted_at = now
+            count.save(update_fields=['status', 'posted_at'])
+
+            stock_changed(count.owner_id, [s.pk for s in updated] + [s.pk for s in created])
+
+        self.status, self.posted_at = count.status, count.posted_at
+        return {'adjusted_lines': len(variances), 'net_variance': str(sum(variances.values(), 0))}
+
+class CycleCountLine(models.Model):
+    count = models.ForeignKey(CycleCount, related_name='lines', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+    batch = models.ForeignKey(Batch, null=True, blank=True, on_delete=models.SET_NULL)
+
+    expected_quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    counted_quantity = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        unique_together = ('count', 'product', 'location', 'batch')
+
+
+# --- 11. SALES ROLLUPS ---
+class SalesRollup(UserOwnedModel):
+    """
+    Sales totals per owner, month and product, kept up to date as sales orders
+    complete (and rebuildable with rebuild_sales_rollups), so profitability
+    reports never have to scan order lines.
+    """
+    month = models.DateField(help_text="First day of the month")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # The category of the product's first sale that month
+    category = models.ForeignKey(Category, null=True, blank=True, on_delete=models.SET_NULL)
+
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('owner', 'month', 'product')
+        indexes = [models.Index(fields=['owner', 'month'])]
+
+    @property
+    def margin(self):
+        return self.revenue - self.cost
+
+    @classmethod
+    def add_order(cls, order, items):
+        """
+        Adds a completed sales order's lines, with their cost and category
+        snapshots, to its month. Call inside the completing transaction.
+        """
+        # Same month rebuild() files the order under
+        month = timezone.localtime(order.completed_at).date().replace(day=1)
+        totals = {}
+        for item in items:
+            row = totals.setdefault(item.product_id, {'category': item.category_id, 'units': 0, 'revenue': 0, 'cost': 0})
+            row['units'] += item.quantity
+            row['revenue'] += item.quantity * item.unit_price
+            row['cost'] += item.quantity * item.unit_cost
+        if not totals:
+            return
+
+        # Make sure every row exists, then lock them all; concurrent completions
+        # for the same month serialize here instead of failing on the unique key
+        cls.objects.bulk_create(
+            [cls(owner_id=order.owner_id, month=month, product_id=pid, category_id=row['category']) for pid, row in totals.items()],
+            ignore_conflicts=True,
+        )
+        rollups = list(cls.objects.select_for_update().filter(owner_id=order.owner_id, month=month, product_id__in=totals))
+        for rollup in rollups:
+            row = totals[rollup.product_id]
+            rollup.units += row['units']
+            rollup.revenue += row['revenue']
+            rollup.cost += row['cost']
+        cls.objects.bulk_update(rollups, ['units', 'revenue', 'cost'])
+
+    @classmethod
+    def rebuild(cls, owner_id):
+        """
+        Recomputes all of an owner's rollups from completed sales orders with one
+        grouped query. Reads the same line snapshots as add_order(), so it gives
+        the same figures however the products were edited since.
+        """
+        totals = (
+            # Orders marked completed without complete() have no completion time or cost snapshot
+            OrderItem.objects.filter(
+                order__owner_id=owner_id, order__order_type='SO', order__status='COMPLETED', order__completed_at__isnull=False,
+            )
+            .annotate(month=TruncMonth('order__completed_at', output_field=models.DateField()))
+            .values('month', 'product_id', 'category_id')
+            .annotate(
+                units=models.Sum('quantity'),
+                revenue=models.Sum(models.F('quantity') * models.F('unit_price'), output_field=models.DecimalField()),
+                cost=models.Sum(models.F('quantity') * models.F('unit_cost'), output_field=models.DecimalField()),
+                first_sale=models.Min('order__completed_at'),
+            )
+            .order_by('first_sale')
+        )
+        # A product recategorised mid-month has a group per category; like
+        # add_order(), file them all under the category of the first sale
+        rollups = {}
+        for row in totals.iterator():
+            rollup = rollups.get((row['month'], row['product_id']))
+            if rollup is None:
+                rollups[(row['month'], row['product_id'])] = cls(
+                    owner_id=owner_id, month=row['month'], product_id=row['product_id'], category_id=row['category_id'],
+                    units=row['units'], revenue=row['revenue'], cost=row['cost'],
+                )
+            else:
+                rollup.units += row['units']
+                rollup.revenue += row['revenue']
+                rollup.cost += row['cost']
+        rollups = list(rollups.values())
+        with transaction.atomic():
+            cls.objects.filter(owner_id=owner_id).delete()
+            cls.objects.bulk_create(rollups, batch_size=2000)
+        return len(rollups)
+
+
+# --- 12. TRANSACTION ARCHIVE ---
+class LedgerCheckpoint(UserOwnedModel):
+    """
+    The net quantity that archived transactions moved into a product/location.
+    Ledger balances are checkpoint + live transactions, so archiving changes
+    nothing for reconciliation.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    as_of = models.DateTimeField(null=True, blank=True, help_text="Covers every transaction before this time")
+
+    class Meta:
+        unique_together = ('product', 'location')
+
+
+class TransactionArchive(UserOwnedModel):
+    """
+    One month of an owner's transactions, moved out of InventoryTransaction by
+    archive_transactions to keep the live ledger small. Rows are stored
+    column by column (MessagePack, zlib-compressed) and stay readable through
+    the ledger API (transactions/archived/).
+    """
+    # Stored columns; created_at as microseconds since the epoch, quantity as a string
+    COLUMNS = (
+        'id', 'transaction_type', 'product_id', 'quantity',
+        'source_location_id', 'destination_location_id', 'reference', 'created_at',
+    )
+    EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+    month = models.DateField(help_text="First day of the month")
+    row_count = models.PositiveIntegerField(default=0)
+    totals = models.JSONField(default=dict, help_text="Quantity moved per transaction type")
+    data = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('owner', 'month')
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} ({self.row_count} transactions)"
+
+    @classmethod
+    def pack(cls, columns):
+        return zlib.compress(msgpack.packb(columns), 6)
+
+    def unpack(self):
+        return msgpack.unpackb(zlib.decompress(self.data))
+
+    def transactions(self):
+        """ The archived rows as unsaved InventoryTransaction instances, oldest first. """
+        columns = self.unpack()
+        rows = []
+        for values in zip(*(columns[name] for name in self.COLUMNS)):
+            row = dict(zip(self.COLUMNS, values))
+            row['quantity'] = Decimal(row['quantity'])
+            row['created_at'] = self.EPOCH + timedelta(microseconds=row['created_at'])
+            rows.append(InventoryTransaction(owner_id=self.owner_id, **row))
+        return rows
+
+    @classmethod
+    def archive_before(cls, owner_id, cutoff, chunk_size=2000):
+        """
+        Moves an owner's transactions older than `cutoff` into monthly archives,
+        one transaction per month: fold the month into the ledger checkpoints,
+        write (or extend) its archive, delete the live rows. Returns the number
+        of transactions archived.
+        """
+        old = InventoryTransaction.objects.filter(owner_id=owner_id, created_at__lt=cutoff)
+        months = (
+            old.annotate(month=TruncMonth('created_at', output_field=models.DateField()))
+            .values_list('month', flat=True).distinct().order_by('month')
+        )
+        archived = 0
+        for month in list(months):
+            start = timezone.make_aware(datetime.combine(month, time.min))
+            end = timezone.make_aware(datetime.combine((month + timedelta(days=32)).replace(day=1), time.min))
+            with transaction.atomic():
+                archived += cls._archive_month(owner_id, month, old.filter(created_at__gte=start, created_at__lt=end), cutoff, chunk_size)
+        return archived
+
+    @classmethod
+    def _archive_month(cls, owner_id, month, queryset, cutoff, chunk_size):
+        archive = cls.objects.select_for_update().filter(owner_id=owner_id, month=month).first()
+        if archive is None:
+            archive = cls(owner_id=owner_id, month=month)
+            columns = {name: [] for name in cls.COLUMNS}
+        else:
+            # Backdated rows arriving after the month was archived
+            columns = archive.unpack()
+        totals = {kind: Decimal(value) for kind, value in archive.totals.items()}
+        net = {}
+
+        rows = queryset.order_by('created_at', 'id').values_list(*cls.COLUMNS)
+        for row in rows.iterator(chunk_size=chunk_size):
+            row = dict(zip(cls.COLUMNS, row))
+            quantity = row['quantity']
+            totals[row['transaction_type']] = totals.get(row['transaction_type'], 0) + quantity
+            if row['source_location_id']:
+                key = (row['product_id'], row['source_location_id'])
+                net[key] = net.get(key, 0) - quantity
+            if row['destination_location_id']:
+                key = (row['product_id'], row['destination_location_id'])
+                net[key] = net.get(key, 0) + quantity
+            row['quantity'] = str(quantity)
+            row['created_at'] = (row['created_at'] - cls.EPOCH) // timedelta(microseconds=1)
+            for name in cls.COLUMNS:
+                columns[name].append(row[name])
+
+        ids = columns['id'][archive.row_count:]
+        if not ids:
+            return 0
+
+        # Checkpoints: create the missing ones, then lock and add to all of them
+        LedgerCheckpoint.objects.bulk_create(
+            [LedgerCheckpoint(owner_id=owner_id, product_id=product_id, location_id=location_id) for product_id, location_id in net],
+            ignore_conflicts=True,
+        )
+        product_ids = sorted({product_id for product_id, _ in net})
+        changed = []
+        for i in range(0, len(product_ids), chunk_size):
+            checkpoints = LedgerCheckpoint.objects.select_for_update().filter(
+                owner_id=owner_id, product_id__in=product_ids[i:i + chunk_size]
+            )
+            for checkpoint in checkpoints:
+                delta = net.get((checkpoint.product_id, checkpoint.location_id))
+                if delta is not None:
+                    checkpoint.quantity += delta
+                    checkpoint.as_of = max(cutoff, checkpoint.as_of or cutoff)
+                    changed.append(checkpoint)
+        LedgerCheckpoint.objects.bulk_update(changed, ['quantity', 'as_of'], batch_size=chunk_size)
+
+        archive.row_count = len(columns['id'])
+        archive.totals = {kind: str(value) for kind, value in totals.items()}
+        archive.data = cls.pack(columns)
+        archive.save()
+
+        for i in range(0, len(ids), chunk_size):
+            InventoryTransaction.objects.filter(pk__in=ids[i:i + chunk_size]).delete()
+        return len(ids)
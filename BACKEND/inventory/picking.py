@@ -0,0 +1,230 @@
+"""
+Pick lists and putaway suggestions for orders, worked out in-process from the
+zone/aisle/bay/level coordinates on Location. Each needs two queries besides
+the order lines. Nothing is reserved or moved: the results are instructions
+for the people on the floor.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from .models import Location, Stock
+
+ROUTES = ('serpentine', 'nearest')
+
+# Walking cost model, in bay lengths
+AISLE_PITCH = 3   # from one aisle to the next along a cross aisle
+ZONE_CHANGE = 50  # leaving one zone for another via the dock
+
+CENTS = Decimal('0.01')
+
+# values() lookups of a location, as (output key, lookup) pairs
+_LOCATION_FIELDS = (
+    ('location', 'id'), ('location_name', 'name'), ('warehouse', 'warehouse_id'),
+    ('warehouse_name', 'warehouse__name'), ('zone', 'zone'), ('aisle', 'aisle'), ('bay', 'bay'), ('level', 'level'),
+)
+
+
+def _position(stop):
+    """ Sort key walking out from the dock; locations without an aisle come last. """
+    placed = stop['aisle'] is not None
+    return (not placed, stop['zone'], stop['aisle'] or 0, stop['bay'] or 0, stop['level'] or 0, stop['location_name'], stop['location'])
+
+
+def _distance(a, b, depth):
+    """
+    Walking distance between two locations in a rectangular layout with cross
+    aisles at both ends: within an aisle walk along it, otherwise leave by the
+    front or back end, whichever is shorter.
+    """
+    a_aisle, a_bay, b_aisle, b_bay = a['aisle'] or 0, a['bay'] or 0, b['aisle'] or 0, b['bay'] or 0
+    if a['zone'] != b['zone']:
+        return ZONE_CHANGE + (a_aisle + b_aisle) * AISLE_PITCH + a_bay + b_bay
+    if a_aisle == b_aisle:
+        return abs(a_bay - b_bay)
+    return abs(a_aisle - b_aisle) * AISLE_PITCH + min(a_bay + b_bay, 2 * depth - a_bay - b_bay)
+
+
+def _dock(stops):
+    return {'zone': min(stop['zone'] for stop in stops), 'aisle': 0, 'bay': 0}
+
+
+def serpentine_route(stops):
+    """
+    S-shaped route: zones in order, every aisle walked end to end, alternating
+    direction so each aisle starts where the previous one finished.
+    """
+    placed = sorted((stop for stop in stops if stop['aisle'] is not None), key=_position)
+    unplaced = sorted((stop for stop in stops if stop['aisle'] is None), key=_position)
+    turns = {}
+    for stop in placed:
+        turns.setdefault((stop['zone'], stop['aisle']), len(turns))
+
+    def key(stop):
+        direction = 1 if turns[(stop['zone'], stop['aisle'])] % 2 == 0 else -1
+        return (stop['zone'], stop['aisle'], direction * (stop['bay'] or 0), stop['level'] or 0, stop['location'])
+
+    return sorted(placed, key=key) + unplaced
+
+
+def nearest_neighbour_route(stops, depth):
+    """ Greedy route from the dock, always walking to the closest location not visited yet. """
+    placed = [stop for stop in stops if stop['aisle'] is not None]
+    unplaced = sorted((stop for stop in stops if stop['aisle'] is None), key=_position)
+    route, current = [], _dock(placed) if placed else None
+    remaining = sorted(placed, key=_position)
+    while remaining:
+        # Ties go to the stop nearer the dock in walking order, so routes are deterministic
+        best = min(range(len(remaining)), key=lambda i: _distance(current, remaining[i], depth))
+        current = remaining.pop(best)
+        route.append(current)
+    return route + unplaced
+
+
+def route_distance(route, depth):
+    placed = [stop for stop in route if stop['aisle'] is not None]
+    if not placed:
+        return 0
+    total, current = 0, _dock(placed)
+    for stop in placed:
+        total += _distance(current, stop, depth)
+        current = stop
+    return total
+
+
+def _order_lines(order):
+    """ {product_id: (product, quantity)} with repeated products merged, in order of the lines. """
+    lines = {}
+    for item in order.items.select_related('product').order_by('pk'):
+        product, quantity = lines.get(item.product_id, (item.product, 0))
+        lines[item.product_id] = (product, quantity + item.quantity)
+    return lines
+
+
+def build_pick_list(order, strategy='serpentine'):
+    """
+    Allocates a sales order's lines to locations holding stock and sequences
+    the picks per warehouse. Warehouses that can fill more of the order in
+    full are drawn from first so an order is split as little as possible;
+    within one, expiring batches go first, then the fullest bins.
+    """
+    lines = _order_lines(order)
+    location_lookups = {f'location__{lookup}' if lookup != 'id' else 'location_id': key for key, lookup in _LOCATION_FIELDS}
+    rows = list(
+        Stock.objects.filter(product_id__in=lines, product__owner_id=order.owner_id, quantity__gt=0)
+        .values('id', 'product_id', 'batch_id', 'batch__expiry_date', 'quantity', *location_lookups)
+        .order_by()
+    )
+
+    # How many lines each warehouse could fill on its own
+    held = {}
+    for row in rows:
+        key = (row['location__warehouse_id'], row['product_id'])
+        held[key] = held.get(key, 0) + row['quantity']
+    coverage = {}
+    for (warehouse_id, product_id), quantity in held.items():
+        full = quantity >= lines[product_id][1]
+        covered, units = coverage.get(warehouse_id, (0, 0))
+        coverage[warehouse_id] = (covered + full, units + quantity)
+    rank = {warehouse_id: (-covered, -units) for warehouse_id, (covered, units) in coverage.items()}
+
+    candidates = {}
+    for row in rows:
+        candidates.setdefault(row['product_id'], []).append(row)
+
+    warehouses, short = {}, []
+    for product_id, (product, requested) in lines.items():
+        remaining = Decimal(requested)
+        ordered = sorted(candidates.get(product_id, ()), key=lambda row: (
+            rank[row['location__warehouse_id']], row['location__warehouse_id'],
+            row['batch__expiry_date'] or datetime.date.max, -row['quantity'], row['location_id'],
+        ))
+        for row in ordered:
+            if remaining <= 0:
+                break
+            take = min(row['quantity'], remaining)
+            remaining -= take
+            pick = {key: row[lookup] for lookup, key in location_lookups.items()}
+            pick.update(product=product_id, sku=product.sku, name=product.name, batch=row['batch_id'], quantity=take)
+            warehouses.setdefault(row['location__warehouse_id'], []).append(pick)
+        if remaining > 0:
+            short.append({
+                'product': product_id, 'sku': product.sku, 'requested': str(Decimal(requested).quantize(CENTS)),
+                'allocated': str((requested - remaining).quantize(CENTS)),
+            })
+
+    result = []
+    for warehouse_id, picks in sorted(warehouses.items(), key=lambda item: (rank[item[0]], item[0])):
+        name = picks[0]['warehouse_name']
+        # Route over locations; several picks at one location are made together
+        stops = {}
+        for pick in picks:
+            stops.setdefault(pick['location'], pick)
+        stops = list(stops.values())
+        depth = max((stop['bay'] or 0 for stop in stops), default=0)
+        route = serpentine_route(stops) if strategy == 'serpentine' else nearest_neighbour_route(stops, depth)
+        order_of = {stop['location']: i for i, stop in enumerate(route)}
+        picks.sort(key=lambda pick: (order_of[pick['location']], pick['product'], pick['batch'] or 0))
+        for sequence, pick in enumerate(picks, start=1):
+            pick['sequence'] = sequence
+            pick['quantity'] = str(pick['quantity'].quantize(CENTS))
+            del pick['warehouse'], pick['warehouse_name']
+        result.append({
+            'warehouse': warehouse_id, 'name': name,
+            'distance': route_distance(route, depth), 'picks': picks,
+        })
+    return {'order': order.id, 'strategy': strategy, 'warehouses': result, 'short': short}
+
+
+def suggest_putaway(order, warehouse_id=None):
+    """
+    Where to put away a purchase order's lines: first the locations already
+    holding the product, nearest the dock first and up to their capacity, then
+    empty locations. Locations holding other products are never suggested.
+    """
+    lines = _order_lines(order)
+    locations = Location.objects.filter(warehouse__owner_id=order.owner_id)
+    if warehouse_id is not None:
+        locations = locations.filter(warehouse_id=warehouse_id)
+
+    slots = {
+        row['id']: {**{key: row[lookup] for key, lookup in _LOCATION_FIELDS}, 'capacity': row['capacity'], 'used': row['used'] or 0}
+        for row in locations.annotate(used=Sum('stock__quantity'))
+        .values('capacity', 'used', *(lookup for _, lookup in _LOCATION_FIELDS))
+    }
+    holding = {}
+    for product_id, location_id in (
+        Stock.objects.filter(product_id__in=lines, location__in=locations, quantity__gt=0)
+        .values_list('product_id', 'location_id').distinct()
+    ):
+        holding.setdefault(product_id, []).append(slots[location_id])
+    claimed = {slot['location'] for held_slots in holding.values() for slot in held_slots}
+    empty = sorted((slot for slot in slots.values() if slot['used'] <= 0 and slot['location'] not in claimed), key=_position)
+
+    suggestions = []
+    for product_id, (product, quantity) in lines.items():
+        remaining, placements = Decimal(quantity), []
+        existing = sorted(holding.get(product_id, ()), key=_position)
+        for slot, is_existing in [(slot, True) for slot in existing] + [(slot, False) for slot in empty]:
+            if remaining <= 0:
+                break
+            if not is_existing and slot['location'] in claimed:
+                continue
+            free = remaining if slot['capacity'] is None else slot['capacity'] - slot['used']
+            take = min(free, remaining)
+            if take <= 0:
+                continue
+            slot['used'] += take
+            remaining -= take
+            claimed.add(slot['location'])
+            placements.append({
+                **{key: slot[key] for key, _ in _LOCATION_FIELDS},
+                'quantity': str(take.quantize(CENTS)), 'existing': is_existing,
+            })
+        suggestions.append({
+            'product': product_id, 'sku': product.sku, 'name': product.name,
+            'quantity': str(Decimal(quantity).quantize(CENTS)), 'placements': placements,
+            'unplaced': str(remaining.quantize(CENTS)),
+        })
+    return {'order': order.id, 'lines': suggestions}
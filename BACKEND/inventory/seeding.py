@@ -0,0 +1,296 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Category, Product, ProductKit, Warehouse, Location, Batch, Stock, InventoryTransaction, Order, OrderItem
+)
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """
+    Lets bulk_create write the given auto_now_add fields as set on the objects,
+    so a generated history can be spread over the past instead of stamped now.
+    """
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+class LedgerBuilder:
+    """
+    Generates InventoryTransaction rows and flushes them with bulk_create in
+    chunks, keeping the balance of every (product, location) slot as it goes.
+    bulk_create bypasses InventoryTransaction.save(), so stock isn't touched
+    per row; stock_rows() turns the final balances into Stock rows instead.
+    """
+
+    def __init__(self, owner_id, chunk_size=5000, rng=None):
+        self.owner_id = owner_id
+        self.chunk_size = chunk_size
+        self.rng = rng or random.Random(0)
+        self.balances = {}
+        self.written = 0
+        self._pending = []
+
+    def held(self, product_id, location_id):
+        return self.balances.get((product_id, location_id), 0)
+
+    def add(self, tx_type, product_id, qty, source=None, destination=None, reference='', at=None):
+        # Same bookkeeping as InventoryTransaction.save(): out of source, into destination
+        if source is not None:
+            self.balances[(product_id, source)] = self.held(product_id, source) - qty
+        if destination is not None:
+            self.balances[(product_id, destination)] = self.held(product_id, destination) + qty
+
+        tx = InventoryTransaction(
+            owner_id=self.owner_id, transaction_type=tx_type, product_id=product_id, quantity=qty,
+            source_location_id=source, destination_location_id=destination, reference=reference,
+        )
+        if at is not None:
+            tx.created_at = at
+        self._pending.append(tx)
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            InventoryTransaction.objects.bulk_create(self._pending, batch_size=self.chunk_size)
+            self.written += len(self._pending)
+            self._pending = []
+
+    def stock_rows(self, batches=None):
+        """
+        Stock rows matching the ledger. Slots of batch-tracked products are split
+        across the product's batches (batches: product id -> batch ids), which
+        keeps the per-slot total equal to the ledger balance.
+        """
+        batches = batches or {}
+        for (product_id, location_id), qty in self.balances.items():
+            batch_ids = batches.get(product_id)
+            if not batch_ids or qty <= 0:
+                yield Stock(product_id=product_id, location_id=location_id, quantity=qty)
+                continue
+            remaining = qty
+            for batch_id in batch_ids[:-1]:
+                part = self.rng.randint(0, remaining)
+                remaining -= part
+                yield Stock(product_id=product_id, location_id=location_id, batch_id=batch_id, quantity=part)
+            yield Stock(product_id=product_id, location_id=location_id, batch_id=batch_ids[-1], quantity=remaining)
+
+
+def seed_tenant(owner, products=1000, locations=50, transactions=10000, orders=200, items_per_order=5,
+                chunk_size=2000, rng=None):
+    """
+    Fills an owner's account with synthetic inventory using bulk_create only.
+    Stock balances are derived from the generated ledger, so the data passes
+    reconcile_stock. Orders are left CONFIRMED, ready to be completed.
+    """
+    rng = rng or random.Random(0)
+
+    category = Category.objects.create(owner=owner, name="Seeded")
+    product_rows = Product.objects.bulk_create([
+        Product(
+            owner=owner, name=f"Item {i}", sku=f"SKU-{i:07d}", category=category,
+            cost_price=Decimal(rng.randint(100, 5000)) / 100,
+            selling_price=Decimal(rng.randint(5000, 9000)) / 100,
+            low_stock_threshold=rng.randint(0, 20),
+        )
+        for i in range(products)
+    ], batch_size=chunk_size)
+
+    warehouse = Warehouse.objects.create(owner=owner, name="Seeded WH", address="-")
+    location_rows = Location.objects.bulk_create(
+        [Location(warehouse=warehouse, name=f"BIN-{i:05d}") for i in range(locations)], batch_size=chunk_size
+    )
+
+    product_ids = [p.pk for p in product_rows]
+    location_ids = [loc.pk for loc in location_rows]
+    ledger = LedgerBuilder(owner.pk, chunk_size=chunk_size, rng=rng)
+    for _ in range(transactions):
+        product_id, location_id = rng.choice(product_ids), rng.choice(location_ids)
+        held = ledger.held(product_id, location_id)
+        # Only ship what the slot actually holds, so no balance goes negative
+        if held and rng.random() < 0.4:
+            ledger.add('OUT', product_id, rng.randint(1, held), source=location_id, reference="seed")
+        else:
+            ledger.add('IN', product_id, rng.randint(1, 50), destination=location_id, reference="seed")
+    ledger.flush()
+    Stock.objects.bulk_create(ledger.stock_rows(), batch_size=chunk_size)
+
+    order_rows = Order.objects.bulk_create([
+        Order(owner=owner, order_type=rng.choice(['PO', 'SO']), status='CONFIRMED', customer_name="Seed")
+        for _ in range(orders)
+    ], batch_size=chunk_size)
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product_id=rng.choice(product_ids), quantity=rng.randint(1, 5), unit_price=Decimal('9.99'))
+        for order in order_rows for _ in range(items_per_order)
+    ], batch_size=chunk_size)
+
+    return {
+        'warehouse': warehouse,
+        'locations': location_ids,
+        'products': product_ids,
+        'orders': [o.pk for o in order_rows],
+    }
+
+
+class CatalogSeeder:
+    """
+    Builds a realistic account for one owner: a category tree, products with
+    kits and batches, several warehouses, and a transaction history spread
+    over the past `days` whose balances become the Stock table.
+    """
+
+    def __init__(self, owner, rng=None, chunk_size=5000):
+        self.owner = owner
+        self.rng = rng or random.Random(owner.pk)
+        self.chunk_size = chunk_size
+
+    def categories(self, count, depth=3):
+        """ Roughly `count` categories spread over `depth` levels; returns leaf ids. """
+        per_level = max(1, round(count ** (1 / depth)))
+        parents, created = [None], 0
+        for level in range(depth):
+            rows = []
+            for parent in parents:
+                for _ in range(per_level):
+                    if created + len(rows) >= count:
+                        break
+                    rows.append(Category(owner=self.owner, name=f"Cat {level}.{created + len(rows)}", parent_id=parent))
+            if not rows:
+                break
+            Category.objects.bulk_create(rows, batch_size=self.chunk_size)
+            created += len(rows)
+            parents = [c.pk for c in rows]
+        return parents
+
+    def products(self, count, category_ids, kit_ratio=0.02, batch_ratio=0.1, batches_per_product=3):
+        """ Returns (product ids that hold stock, product id -> batch ids). """
+        rng = self.rng
+        rows = []
+        for i in range(count):
+            cost = rng.randint(50, 20000)
+            rows.append(Product(
+                owner=self.owner, name=f"Product {i}", sku=f"SKU-{i:08d}",
+                barcode=f"{rng.randrange(10 ** 12, 10 ** 13)}",
+                category_id=rng.choice(category_ids),
+                cost_price=Decimal(cost) / 100,
+                selling_price=Decimal(int(cost * rng.uniform(1.1, 2.5))) / 100,
+                low_stock_threshold=rng.randint(0, 25),
+                abc_classification=rng.choices('ABC', weights=(1, 3, 6))[0],
+                is_batch_tracked=rng.random() < batch_ratio,
+                is_kit=rng.random() < kit_ratio,
+            ))
+        Product.objects.bulk_create(rows, batch_size=self.chunk_size)
+
+        stocked = [p.pk for p in rows if not p.is_kit]
+        kits = [p.pk for p in rows if p.is_kit]
+        if stocked:
+            ProductKit.objects.bulk_create([
+                ProductKit(parent_product_id=kit, child_product_id=child, quantity=rng.randint(1, 4))
+                for kit in kits
+                for child in rng.sample(stocked, min(len(stocked), rng.randint(2, 4)))
+            ], batch_size=self.chunk_size)
+
+        today = timezone.now().date()
+        batch_rows = [
+            Batch(product_id=p.pk, batch_number=f"B{p.pk}-{n}", expiry_date=today + timedelta(days=rng.randint(-30, 720)))
+            for p in rows if p.is_batch_tracked and not p.is_kit
+            for n in range(batches_per_product)
+        ]
+        Batch.objects.bulk_create(batch_rows, batch_size=self.chunk_size)
+        batches = {}
+        for batch in batch_rows:
+            batches.setdefault(batch.product_id, []).append(batch.pk)
+        return stocked, batches
+
+    def warehouses(self, count, locations_per_warehouse):
+        """ Returns one list of location ids per warehouse. """
+        warehouse_rows = Warehouse.objects.bulk_create([
+            Warehouse(owner=self.owner, name=f"Warehouse {i}", address=f"{i} Seed Street") for i in range(count)
+        ])
+        location_rows = Location.objects.bulk_create([
+            Location(warehouse=w, name=f"A{n // 100:02d}-B{n % 100:02d}")
+            for w in warehouse_rows for n in range(locations_per_warehouse)
+        ], batch_size=self.chunk_size)
+        per_warehouse = {}
+        for loc in location_rows:
+            per_warehouse.setdefault(loc.warehouse_id, []).append(loc.pk)
+        return list(per_warehouse.values())
+
+    def history(self, transactions, product_ids, warehouses, days=365, slots_per_product=3):
+        """
+        Writes `transactions` ledger rows in time order: receipts, sales from
+        slots that hold stock, moves within a warehouse, returns and small
+        count adjustments. Returns the LedgerBuilder holding final balances.
+        """
+        rng = self.rng
+        ledger = LedgerBuilder(self.owner.pk, chunk_size=self.chunk_size, rng=rng)
+        # Each product lives in a few slots of one warehouse, as it would on a real shop floor
+        homes = {}
+        for product_id in product_ids:
+            locations = rng.choice(warehouses)
+            homes[product_id] = rng.sample(locations, min(len(locations), slots_per_product))
+
+        start = timezone.now() - timedelta(days=days)
+        step = timedelta(days=days) / max(transactions, 1)
+        choice, random_ = rng.choice, rng.random
+
+        with explicit_timestamps(InventoryTransaction._meta.get_field('created_at')):
+            for n in range(transactions):
+                at = start + step * n
+                product_id = choice(product_ids)
+                slots = homes[product_id]
+                location_id = choice(slots)
+                held = ledger.held(product_id, location_id)
+                roll = random_()
+
+                if not held or roll < 0.35:
+                    ledger.add('IN', product_id, rng.randint(5, 100), destination=location_id, reference=f"PO-{n}", at=at)
+                elif roll < 0.8:
+                    ledger.add('OUT', product_id, rng.randint(1, min(held, 10)), source=location_id, reference=f"SO-{n}", at=at)
+                elif roll < 0.9 and len(slots) > 1:
+                    target = choice([s for s in slots if s != location_id])
+                    ledger.add('MOVE', product_id, rng.randint(1, held), source=location_id, destination=target, reference="Replenish", at=at)
+                elif roll < 0.95:
+                    ledger.add('RET', product_id, rng.randint(1, 3), destination=location_id, reference=f"RMA-{n}", at=at)
+                else:
+                    # Count corrections: a shrinkage never takes more than the slot holds
+                    qty = rng.randint(1, min(held, 5))
+                    if random_() < 0.7:
+                        ledger.add('ADJ', product_id, qty, source=location_id, reference="Cycle count", at=at)
+                    else:
+                        ledger.add('ADJ', product_id, qty, destination=location_id, reference="Cycle count", at=at)
+            ledger.flush()
+        return ledger
+
+    def stock(self, ledger, batches):
+        rows = []
+        for row in ledger.stock_rows(batches):
+            rows.append(row)
+            if len(rows) >= self.chunk_size:
+                Stock.objects.bulk_create(rows)
+                rows = []
+        Stock.objects.bulk_create(rows)
+
+    def run(self, products, categories, warehouses, locations, transactions, days=365, kit_ratio=0.02, batch_ratio=0.1):
+        """ Seeds everything for the owner; each step commits on its own so a huge history doesn't hold one transaction open. """
+        with transaction.atomic():
+            leaf_ids = self.categories(categories)
+            product_ids, batches = self.products(products, leaf_ids, kit_ratio=kit_ratio, batch_ratio=batch_ratio)
+            location_ids = self.warehouses(warehouses, locations)
+        ledger = self.history(transactions, product_ids, location_ids, days=days)
+        with transaction.atomic():
+            self.stock(ledger, batches)
+        return ledger.written
@@ -1,5 +1,6 @@
+from decimal import Decimal
 from rest_framework import serializers
-from .models import Product, Category, Supplier, Warehouse, Location, Stock, Order, OrderItem, InventoryTransaction
+from .models import Product, Category, Supplier, Warehouse, Location, Stock, Order, OrderItem, InventoryTransaction, Job, TransferOrder, TransferLine, CycleCount
 
 class CategorySerializer(serializers.ModelSerializer):
     # Owner is hidden/read-only (assigned automatically by view)
@@ -15,6 +16,7 @@ class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
         model = Supplier
         fields = '__all__'
+        read_only_fields = ['lead_time_samples', 'lead_time_mean_days', 'lead_time_p90_days', 'lead_time_updated_at']
 
 class ProductSerializer(serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.phone_number')
@@ -26,6 +28,10 @@ class ProductSerializer(serializers.ModelSerializer):
         fields = '__all__'
     
     def get_total_stock(self, obj):
+        # Views serializing many products annotate the total in the same query
+        if hasattr(obj, 'stock_total'):
+            return obj.stock_total if obj.stock_total is not None else 0
+
         # Calculate total stock across all locations
         stocks = Stock.objects.filter(product=obj)
         return sum(s.quantity for s in stocks)
@@ -63,7 +69,9 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ['id', 'owner', 'order_type', 'status', 'supplier', 'customer_name', 'created_at', 'items', 'items_data']
+        fields = ['id', 'owner', 'order_type', 'status', 'supplier', 'customer_name', 'created_at', 'confirmed_at', 'completed_at', 'items', 'items_data']
+        # Orders are completed through the complete action, which moves stock and stamps completed_at
+        read_only_fields = ['status', 'confirmed_at', 'completed_at']
 
     def create(self, validated_data):
         items_data = validated_data.pop('items_data', [])
@@ -80,4 +88,94 @@ class TransactionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = InventoryTransaction
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'job_type', 'status', 'payload', 'result', 'error', 'attempts', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+
+class TransferLineSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = TransferLine
+        fields = ['id', 'product', 'product_name', 'quantity']
+
+class TransferLineInputSerializer(serializers.Serializer):
+    # Plain ids: a PrimaryKeyRelatedField would run one lookup per line
+    product = serializers.IntegerField()
+    quantity = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+
+class AvailabilityLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+
+class TransferOrderSerializer(serializers.ModelSerializer):
+    owner = serializers.ReadOnlyField(source='owner.phone_number')
+    lines = TransferLineSerializer(many=True, read_only=True)
+    lines_data = TransferLineInputSerializer(many=True, write_only=True)
+
+    class Meta:
+        model = TransferOrder
+        fields = ['id', 'owner', 'source_location', 'destination_location', 'status', 'reference',
+                  'created_at', 'completed_at', 'lines', 'lines_data']
+        read_only_fields = ['status', 'completed_at']
+
+    def validate(self, attrs):
+        user = self.context['request'].user
+        source, destination = attrs['source_location'], attrs['destination_location']
+        if source == destination:
+            raise serializers.ValidationError("Source and destination must differ.")
+        if source.warehouse.owner_id != user.id or destination.warehouse.owner_id != user.id:
+            raise serializers.ValidationError("Invalid location or access denied.")
+
+        if not attrs['lines_data']:
+            raise serializers.ValidationError("A transfer needs at least one line.")
+        # One query for the ownership of every product on the transfer
+        product_ids = {line['product'] for line in attrs['lines_data']}
+        owned = set(Product.objects.filter(owner=user, id__in=product_ids).values_list('id', flat=True))
+        if product_ids - owned:
+            raise serializers.ValidationError("Invalid product or access denied.")
+        return attrs
+
+    def create(self, validated_data):
+        lines_data = validated_data.pop('lines_data')
+        # Owner is passed in save() via ViewSet
+        transfer = TransferOrder.objects.create(**validated_data)
+        TransferLine.objects.bulk_create(
+            [TransferLine(transfer=transfer, product_id=line['product'], quantity=line['quantity']) for line in lines_data],
+            batch_size=500
+        )
+        # Reload with the lines prefetched so the response isn't one product query per line
+        return TransferOrder.objects.prefetch_related('lines__product').get(pk=transfer.pk)
+
+class CycleCountSerializer(serializers.ModelSerializer):
+    owner = serializers.ReadOnlyField(source='owner.phone_number')
+    # Lines can run to tens of thousands; they're served by the lines action instead
+    line_count = serializers.IntegerField(read_only=True)
+    counted_lines = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = CycleCount
+        fields = ['id', 'owner', 'warehouse', 'location', 'status', 'reference',
+                  'created_at', 'posted_at', 'line_count', 'counted_lines']
+        read_only_fields = ['status', 'posted_at']
+
+    def validate(self, attrs):
+        user = self.context['request'].user
+        warehouse, location = attrs['warehouse'], attrs.get('location')
+        if warehouse.owner_id != user.id:
+            raise serializers.ValidationError("Invalid warehouse or access denied.")
+        if location is not None and location.warehouse_id != warehouse.id:
+            raise serializers.ValidationError("Location must belong to the counted warehouse.")
+        return attrs
+
+class CycleCountEntrySerializer(serializers.Serializer):
+    # Plain ids, resolved set-wise by the view
+    product = serializers.IntegerField()
+    location = serializers.IntegerField(required=False)
+    batch = serializers.IntegerField(required=False, allow_null=True)
+    counted = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0'))
@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Category, Product, Warehouse, Location, Stock, Order, Tombstone
+
+
+# --- DELTA SYNC TOMBSTONES ---
+# Deletes are recorded so /sync/ can tell clients which cached rows to drop.
+
+def _origin_model(origin):
+    """ The model whose delete() started this (possibly cascading) deletion. """
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+# (owner id, pending tombstones) while inside batched_tombstones()
+_batch = ContextVar('tombstone_batch', default=None)
+
+
+@contextmanager
+def batched_tombstones(owner_id):
+    """
+    For bulk deletes of one owner's rows: the tombstones of every delete in the
+    block are written with one bulk_create at the end instead of an INSERT per
+    row, and receivers take the owner from here rather than looking it up.
+    """
+    pending = []
+    token = _batch.set((owner_id, pending))
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+    Tombstone.objects.bulk_create(pending, batch_size=2000)
+
+
+def _record(owner_id, model_name, object_id):
+    tombstone = Tombstone(owner_id=owner_id, model_name=model_name, object_id=object_id)
+    batch = _batch.get()
+    if batch is None:
+        tombstone.save()
+    else:
+        batch[1].append(tombstone)
+
+
+def _batch_owner():
+    batch = _batch.get()
+    return batch[0] if batch else None
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+def record_owned_delete(sender, instance, origin=None, **kwargs):
+    # Deleting the account itself leaves nobody to sync to
+    if _origin_model(origin) is get_user_model():
+        return
+    _record(instance.owner_id, sender._meta.model_name, instance.pk)
+
+
+@receiver(post_delete, sender=Location)
+def record_location_delete(sender, instance, origin=None, **kwargs):
+    if _origin_model(origin) is get_user_model():
+        return
+    # When a whole warehouse is deleted, take the owner from it instead of one lookup per location
+    owner_id = origin.owner_id if isinstance(origin, Warehouse) else _batch_owner() or instance.warehouse.owner_id
+    _record(owner_id, 'location', instance.pk)
+
+
+@receiver(post_delete, sender=Stock)
+def record_stock_delete(sender, instance, origin=None, **kwargs):
+    # Stock removed along with its product, location or warehouse needs no tombstone
+    # of its own: clients drop stock for deleted products/locations themselves. This
+    # also avoids a product lookup per row on large cascades.
+    if _origin_model(origin) is not Stock:
+        return
+    _record(_batch_owner() or instance.product.owner_id, 'stock', instance.pk)
@@ -1,3 +1,547 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+import msgpack
+import orjson
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import CustomUser, SerialKey
+from .jobs import reconcile_stock
+from .models import (
+    Batch, Category, CycleCount, InventoryTransaction, Job, LedgerCheckpoint, Location, Order, OrderItem, Product, SalesRollup,
+    Stock, Supplier, Tombstone, TransactionArchive, Warehouse,
+)
+from .picking import build_pick_list, nearest_neighbour_route, serpentine_route, suggest_putaway
+from .seeding import seed_tenant
+from .serializers import ProductSerializer, StockSerializer
+
+
+class ValuesListParityTests(TestCase):
+    # The values() list fast path must render exactly what the serializers would
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone_number="1000")
+        now = timezone.now()
+        SerialKey.objects.create(user=cls.user, allow_inventory=True, start_date=now, end_date=now + timedelta(days=1))
+        seed_tenant(cls.user, products=40, locations=5, transactions=200, orders=0)
+        # A product with no stock rows at all
+        Product.objects.create(owner=cls.user, name="Empty", sku="EMPTY", cost_price=1, selling_price=2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_product_list_matches_serializer(self):
+        expected = ProductSerializer(Product.objects.filter(owner=self.user).order_by('pk'), many=True).data
+        response = self.client.get('/api/inventory/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_stock_list_matches_serializer(self):
+        expected = StockSerializer(Stock.objects.filter(product__owner=self.user).order_by('pk'), many=True).data
+        response = self.client.get('/api/inventory/stock/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_msgpack_carries_the_same_payload(self):
+        as_json = orjson.loads(self.client.get('/api/inventory/stock/').content)
+        response = self.client.get('/api/inventory/stock/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), as_json)
+
+
+class CycleCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone_number="1001")
+        now = timezone.now()
+        SerialKey.objects.create(user=cls.user, allow_inventory=True, start_date=now, end_date=now + timedelta(days=1))
+        cls.warehouse = Warehouse.objects.create(owner=cls.user, name="Main", address="1 Dock Road")
+        cls.bin_a = Location.objects.create(warehouse=cls.warehouse, name="A")
+        cls.bin_b = Location.objects.create(warehouse=cls.warehouse, name="B")
+        cls.bolt = Product.objects.create(owner=cls.user, name="Bolt", sku="BOLT", cost_price=1, selling_price=2)
+        cls.nut = Product.objects.create(owner=cls.user, name="Nut", sku="NUT", cost_price=1, selling_price=2)
+        Stock.objects.create(product=cls.bolt, location=cls.bin_a, quantity=10)
+        Stock.objects.create(product=cls.nut, location=cls.bin_b, quantity=4)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Don't leave later tests a throttle bucket drained by these expensive actions
+        self.addCleanup(cache.clear)
+
+    def open_count(self):
+        response = self.client.post('/api/inventory/cycle-counts/', {'warehouse': self.warehouse.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def quantity(self, product):
+        return Stock.objects.get(product=product).quantity
+
+    def test_snapshot_records_expected_quantities(self):
+        count_id = self.open_count()
+        lines = self.client.get(f'/api/inventory/cycle-counts/{count_id}/lines/').data
+        self.assertEqual(
+            [(line['product'], line['location'], line['expected_quantity'], line['counted_quantity']) for line in lines],
+            [(self.bolt.id, self.bin_a.id, 10, None), (self.nut.id, self.bin_b.id, 4, None)],
+        )
+
+    def test_record_counts_updates_lines_and_adds_found_items(self):
+        count_id = self.open_count()
+        response = self.client.post(f'/api/inventory/cycle-counts/{count_id}/counts/', {'entries': [
+            {'product': self.bolt.id, 'location': self.bin_a.id, 'counted': '7'},
+            {'product': self.nut.id, 'location': self.bin_a.id, 'counted': '2'},
+        ]}, format='json')
+        self.assertEqual(response.data, {'updated': 1, 'added': 1})
+        uncounted = self.client.get(f'/api/inventory/cycle-counts/{count_id}/lines/?uncounted=1').data
+        self.assertEqual([line['product'] for line in uncounted], [self.nut.id])
+        for value in ('false', '0'):
+            lines = self.client.get(f'/api/inventory/cycle-counts/{count_id}/lines/?uncounted={value}').data
+            self.assertEqual(len(lines), 3)
+        self.assertEqual(self.client.get(f'/api/inventory/cycle-counts/{count_id}/lines/?uncounted=maybe').status_code, 400)
+
+    def test_post_applies_variances(self):
+        count_id = self.open_count()
+        self.client.post(f'/api/inventory/cycle-counts/{count_id}/counts/', {'entries': [
+            {'product': self.bolt.id, 'location': self.bin_a.id, 'counted': '7'},
+        ]}, format='json')
+        response = self.client.post(f'/api/inventory/cycle-counts/{count_id}/post/', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['adjusted_lines'], 1)
+        self.assertEqual(self.quantity(self.bolt), 7)
+        # Uncounted lines are left alone by default
+        self.assertEqual(self.quantity(self.nut), 4)
+        adjustment = InventoryTransaction.objects.get(transaction_type='ADJ')
+        self.assertEqual((adjustment.product_id, adjustment.quantity, adjustment.source_location_id), (self.bolt.id, 3, self.bin_a.id))
+        self.assertEqual(CycleCount.objects.get(pk=count_id).status, 'POSTED')
+
+    def test_uncounted_as_zero_empties_uncounted_lines(self):
+        count_id = self.open_count()
+        response = self.client.post(f'/api/inventory/cycle-counts/{count_id}/post/', {'uncounted_as_zero': 'true'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.quantity(self.bolt), self.quantity(self.nut)), (0, 0))
+
+    def test_false_strings_are_not_truthy(self):
+        count_id = self.open_count()
+        response = self.client.post(f'/api/inventory/cycle-counts/{count_id}/post/', {'uncounted_as_zero': 'false', 'run_async': '0'}, format='json')
+        # Posted synchronously, with the uncounted stock kept
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.quantity(self.bolt), self.quantity(self.nut)), (10, 4))
+
+    def test_post_rejects_unparseable_flags(self):
+        count_id = self.open_count()
+        response = self.client.post(f'/api/inventory/cycle-counts/{count_id}/post/', {'uncounted_as_zero': 'yes please'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('uncounted_as_zero', response.data)
+        self.assertEqual(CycleCount.objects.get(pk=count_id).status, 'OPEN')
+
+    def test_post_twice_is_rejected(self):
+        count_id = self.open_count()
+        self.assertEqual(self.client.post(f'/api/inventory/cycle-counts/{count_id}/post/', {}, format='json').status_code, 200)
+        response = self.client.post(f'/api/inventory/cycle-counts/{count_id}/post/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Count is posted'})
+
+
+class BulkEditTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.user = CustomUser.objects.create_user(phone_number="1002")
+        cls.other = CustomUser.objects.create_user(phone_number="1003")
+        for user in (cls.user, cls.other):
+            SerialKey.objects.create(user=user, allow_inventory=True, start_date=now, end_date=now + timedelta(days=1))
+        cls.tools = Category.objects.create(owner=cls.user, name="Tools")
+        cls.foreign_category = Category.objects.create(owner=cls.other, name="Theirs")
+        cls.products = [
+            Product.objects.create(owner=cls.user, name=f"Bolt {i}", sku=f"BOLT-{i}", cost_price=1, selling_price=2)
+            for i in range(3)
+        ]
+        cls.nut = Product.objects.create(owner=cls.user, name="Nut", sku="NUT", cost_price=1, selling_price=2)
+        cls.foreign = Product.objects.create(owner=cls.other, name="Bolt", sku="BOLT-X", cost_price=1, selling_price=2)
+        warehouse = Warehouse.objects.create(owner=cls.user, name="Main", address="1 Dock Road")
+        cls.location = Location.objects.create(warehouse=warehouse, name="A")
+        cls.stock = Stock.objects.create(product=cls.products[0], location=cls.location, quantity=5)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Don't leave later tests a throttle bucket drained by these expensive actions
+        self.addCleanup(cache.clear)
+
+    def bulk(self, method, data, resource='products'):
+        return getattr(self.client, method)(f'/api/inventory/{resource}/bulk/', data, format='json')
+
+    def test_patch_changes_by_filter(self):
+        response = self.bulk('patch', {'filter': {'sku_prefix': 'BOLT-'}, 'changes': {'selling_price': '3.50', 'category': self.tools.id}})
+        self.assertEqual(response.data, {'matched': 3, 'updated': 3})
+        self.assertEqual(set(Product.objects.filter(category=self.tools).values_list('selling_price', flat=True)), {Decimal('3.50')})
+        self.assertIsNone(Product.objects.get(pk=self.nut.pk).category_id)
+        # The other tenant's BOLT-X is outside the filter's reach
+        self.assertEqual(Product.objects.get(pk=self.foreign.pk).selling_price, 2)
+
+    def test_patch_items_sets_each_row(self):
+        response = self.bulk('patch', {'items': [
+            {'id': self.products[0].id, 'selling_price': '4'},
+            {'id': self.products[1].id, 'description': 'Zinc', 'low_stock_threshold': 7},
+        ]})
+        self.assertEqual(response.data, {'matched': 2, 'updated': 2})
+        first, second = Product.objects.filter(pk__in=[self.products[0].pk, self.products[1].pk]).order_by('pk')
+        self.assertEqual(first.selling_price, 4)
+        self.assertEqual((second.description, second.low_stock_threshold), ('Zinc', 7))
+
+    def test_patch_stock_quantities(self):
+        response = self.bulk('patch', {'ids': [self.stock.id], 'changes': {'quantity': '9'}}, resource='stock')
+        self.assertEqual(response.data, {'matched': 1, 'updated': 1})
+        self.assertEqual(Stock.objects.get(pk=self.stock.pk).quantity, 9)
+
+    def test_invalid_changes_are_rejected(self):
+        response = self.bulk('patch', {'ids': [self.nut.id], 'changes': {'sku': 'NEW', 'selling_price': 'cheap'}})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['fields']), {'sku', 'selling_price'})
+
+    def test_delete_leaves_tombstones(self):
+        response = self.bulk('delete', {'ids': [self.products[0].id, self.nut.id]})
+        self.assertEqual(response.data, {'deleted': 2, 'cascaded': {'inventory.Stock': 1}})
+        # Cascaded stock needs none: clients drop stock of deleted products themselves
+        self.assertEqual(
+            set(Tombstone.objects.filter(owner=self.user).values_list('model_name', 'object_id')),
+            {('product', self.products[0].id), ('product', self.nut.id)},
+        )
+
+    def test_stock_delete_leaves_tombstones(self):
+        response = self.bulk('delete', {'filter': {'location': self.location.id}}, resource='stock')
+        self.assertEqual(response.data, {'deleted': 1, 'cascaded': {}})
+        self.assertEqual(list(Tombstone.objects.values_list('owner_id', 'model_name', 'object_id')), [(self.user.id, 'stock', self.stock.id)])
+
+    def test_other_tenants_rows_are_rejected(self):
+        for method, data in (
+            ('patch', {'ids': [self.nut.id, self.foreign.id], 'changes': {'selling_price': '1'}}),
+            ('patch', {'items': [{'id': self.foreign.id, 'selling_price': '1'}]}),
+            ('delete', {'ids': [self.foreign.id]}),
+        ):
+            response = self.bulk(method, data)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data, {'error': 'Invalid id or access denied', 'ids': [self.foreign.id]})
+        self.assertTrue(Product.objects.filter(pk=self.foreign.pk, selling_price=2).exists())
+        self.assertEqual(Product.objects.get(pk=self.nut.pk).selling_price, 2)
+
+    def test_other_tenants_category_is_rejected(self):
+        response = self.bulk('patch', {'ids': [self.nut.id], 'changes': {'category': self.foreign_category.id}})
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(Product.objects.get(pk=self.nut.pk).category_id)
+
+    def test_list_and_object_filter_values_are_rejected(self):
+        for value in (['BOLT-'], {'startswith': 'BOLT-'}):
+            response = self.bulk('delete', {'filter': {'sku_prefix': value}})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Product.objects.filter(owner=self.user).count(), 4)
+
+
+class SalesRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone_number="1004")
+        now = timezone.now()
+        SerialKey.objects.create(user=cls.user, allow_inventory=True, start_date=now, end_date=now + timedelta(days=1))
+        warehouse = Warehouse.objects.create(owner=cls.user, name="Main", address="1 Dock Road")
+        cls.location = Location.objects.create(warehouse=warehouse, name="A")
+        cls.tools = Category.objects.create(owner=cls.user, name="Tools")
+        cls.parts = Category.objects.create(owner=cls.user, name="Parts")
+        cls.bolt = Product.objects.create(owner=cls.user, name="Bolt", sku="BOLT", cost_price=1, selling_price=5, category=cls.tools)
+        cls.nut = Product.objects.create(owner=cls.user, name="Nut", sku="NUT", cost_price=2, selling_price=3)
+        Stock.objects.create(product=cls.bolt, location=cls.location, quantity=100)
+        Stock.objects.create(product=cls.nut, location=cls.location, quantity=100)
+
+    def sell(self, *lines):
+        order = Order.objects.create(owner=self.user, order_type='SO')
+        for product, quantity, price in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, unit_price=price)
+        self.assertTrue(order.complete(self.location))
+        return order
+
+    def rollups(self):
+        return sorted(
+            SalesRollup.objects.filter(owner=self.user)
+            .values_list('month', 'product_id', 'category_id', 'units', 'revenue', 'cost')
+        )
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.sell((self.bolt, 2, 5), (self.nut, 1, 3))
+        # Edits after a sale must not restate it
+        Product.objects.filter(pk=self.bolt.pk).update(cost_price=4, category=self.parts)
+        self.bolt.refresh_from_db()
+        self.sell((self.bolt, 1, 6))
+
+        incremental = self.rollups()
+        month = timezone.localtime().date().replace(day=1)
+        self.assertEqual(incremental, [
+            (month, self.bolt.id, self.tools.id, 3, Decimal('16.00'), Decimal('6.00')),
+            (month, self.nut.id, None, 1, Decimal('3.00'), Decimal('2.00')),
+        ])
+        self.assertEqual(SalesRollup.rebuild(self.user.id), 2)
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_rebuild_skips_orders_completed_without_complete(self):
+        self.sell((self.nut, 1, 3))
+        expected = self.rollups()
+        legacy = Order.objects.create(owner=self.user, order_type='SO', status='COMPLETED')
+        OrderItem.objects.create(order=legacy, product=self.bolt, quantity=1, unit_price=5)
+        SalesRollup.rebuild(self.user.id)
+        self.assertEqual(self.rollups(), expected)
+
+    def test_status_cannot_be_set_through_the_api(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.addCleanup(cache.clear)
+        response = client.post('/api/inventory/orders/', {'order_type': 'SO', 'status': 'COMPLETED'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['status'], response.data['completed_at']), ('DRAFT', None))
+
+
+class SupplierLeadTimeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone_number="1005")
+        cls.acme = Supplier.objects.create(owner=cls.user, name="Acme", contact_email="a@example.com", phone="1", lead_time_days=3)
+        cls.idle = Supplier.objects.create(owner=cls.user, name="Idle", contact_email="i@example.com", phone="2")
+
+    def purchase(self, supplier, lead_days, completed_days_ago=1, confirmed=True, status='COMPLETED'):
+        completed = timezone.now() - timedelta(days=completed_days_ago)
+        placed = completed - timedelta(days=lead_days)
+        order = Order.objects.create(owner=self.user, order_type='PO', supplier=supplier)
+        # created_at is auto_now_add, so backdate with update(); confirmed orders sat in draft for a month first
+        Order.objects.filter(pk=order.pk).update(
+            status=status, created_at=placed - timedelta(days=30) if confirmed else placed,
+            confirmed_at=placed if confirmed else None, completed_at=completed if status == 'COMPLETED' else None,
+        )
+
+    def test_mean_and_p90_over_the_window(self):
+        for lead in range(1, 10):
+            self.purchase(self.acme, lead)
+        # Completed straight from draft: measured from creation
+        self.purchase(self.acme, 10, confirmed=False)
+        # Outside the window, and not completed: both ignored
+        self.purchase(self.acme, 100, completed_days_ago=400)
+        self.purchase(self.acme, 100, status='CONFIRMED')
+
+        self.assertEqual(Supplier.refresh_lead_times(owner_id=self.user.id), 2)
+        acme = Supplier.objects.get(pk=self.acme.pk)
+        self.assertEqual(acme.lead_time_samples, 10)
+        self.assertEqual(acme.lead_time_mean_days, Decimal('5.50'))
+        # Nearest rank: the 9th of 10 sorted leads
+        self.assertEqual(acme.lead_time_p90_days, Decimal('9.00'))
+
+    def test_supplier_without_orders_has_no_figures(self):
+        self.purchase(self.acme, 2)
+        Supplier.refresh_lead_times(owner_id=self.user.id)
+        idle = Supplier.objects.get(pk=self.idle.pk)
+        self.assertEqual((idle.lead_time_samples, idle.lead_time_mean_days, idle.lead_time_p90_days), (0, None, None))
+        self.assertIsNotNone(idle.lead_time_updated_at)
+
+
+class TransactionArchiveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone_number="1006")
+        now = timezone.now()
+        SerialKey.objects.create(user=cls.user, allow_inventory=True, start_date=now, end_date=now + timedelta(days=1))
+        warehouse = Warehouse.objects.create(owner=cls.user, name="Main", address="1 Dock Road")
+        cls.bin_a = Location.objects.create(warehouse=warehouse, name="A")
+        cls.bin_b = Location.objects.create(warehouse=warehouse, name="B")
+        cls.bolt = Product.objects.create(owner=cls.user, name="Bolt", sku="BOLT", cost_price=1, selling_price=2)
+        cls.nut = Product.objects.create(owner=cls.user, name="Nut", sku="NUT", cost_price=1, selling_price=2)
+
+        cls.move('IN', cls.bolt, 10, None, cls.bin_a, '2025-03-05')
+        cls.move('MOVE', cls.bolt, 4, cls.bin_a, cls.bin_b, '2025-03-20')
+        cls.move('IN', cls.nut, 5, None, cls.bin_a, '2025-04-02')
+        # This month's, never archived
+        cls.move('OUT', cls.bolt, 1, cls.bin_a, None)
+
+    @classmethod
+    def move(cls, kind, product, quantity, source, destination, day=None):
+        tx = InventoryTransaction.objects.create(
+            owner=cls.user, transaction_type=kind, product=product, quantity=quantity,
+            source_location=source, destination_location=destination, reference=f"{kind} {product.sku}",
+        )
+        if day:
+            # created_at is auto_now_add, so backdate with update()
+            when = timezone.make_aware(datetime.fromisoformat(f"{day}T12:00"))
+            InventoryTransaction.objects.filter(pk=tx.pk).update(created_at=when)
+        return tx
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.addCleanup(cache.clear)
+
+    def archive(self):
+        out = StringIO()
+        # days=0 archives every month before the current one
+        call_command('archive_transactions', days=0, owner=self.user.id, stdout=out)
+        return out.getvalue()
+
+    def checkpoints(self):
+        return dict(
+            ((product_id, location_id), quantity)
+            for product_id, location_id, quantity in LedgerCheckpoint.objects.filter(owner=self.user)
+            .values_list('product_id', 'location_id', 'quantity')
+        )
+
+    def assertReconciles(self):
+        job = Job.objects.create(owner=self.user, job_type='reconcile_stock')
+        self.assertEqual(reconcile_stock(job)['mismatches'], [])
+
+    def test_archiving_keeps_the_ledger_reconciled(self):
+        self.assertIn("archived 3 transactions", self.archive())
+        self.assertEqual(InventoryTransaction.objects.filter(owner=self.user).count(), 1)
+        self.assertEqual(
+            list(TransactionArchive.objects.order_by('month').values_list('month', 'row_count', 'totals')),
+            [
+                (datetime(2025, 3, 1).date(), 2, {'IN': '10.00', 'MOVE': '4.00'}),
+                (datetime(2025, 4, 1).date(), 1, {'IN': '5.00'}),
+            ],
+        )
+        self.assertEqual(self.checkpoints(), {
+            (self.bolt.id, self.bin_a.id): 6, (self.bolt.id, self.bin_b.id): 4, (self.nut.id, self.bin_a.id): 5,
+        })
+        self.assertReconciles()
+
+    def test_rerun_is_a_no_op(self):
+        self.archive()
+        archives = list(TransactionArchive.objects.values_list('month', 'row_count', 'totals', 'data'))
+        checkpoints = self.checkpoints()
+        self.assertIn("Archived 0 transactions", self.archive())
+        self.assertEqual(list(TransactionArchive.objects.values_list('month', 'row_count', 'totals', 'data')), archives)
+        self.assertEqual(self.checkpoints(), checkpoints)
+
+    def test_backdated_row_extends_its_month(self):
+        self.archive()
+        late = self.move('OUT', self.bolt, 2, self.bin_b, None, '2025-03-25')
+        self.assertIn("archived 1 transactions", self.archive())
+
+        march = TransactionArchive.objects.get(owner=self.user, month=datetime(2025, 3, 1).date())
+        self.assertEqual((march.row_count, march.totals), (3, {'IN': '10.00', 'MOVE': '4.00', 'OUT': '2.00'}))
+        self.assertEqual(march.transactions()[-1].id, late.id)
+        self.assertEqual(self.checkpoints()[(self.bolt.id, self.bin_b.id)], 2)
+        self.assertReconciles()
+
+    def test_archived_rows_read_like_the_live_list(self):
+        live = self.client.get('/api/inventory/transactions/').data
+        march = [row for row in live if row['created_at'].startswith('2025-03')]
+        self.archive()
+
+        response = self.client.get('/api/inventory/transactions/archived/', {'month': '2025-03'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, march)
+        months = self.client.get('/api/inventory/transactions/archived/').data
+        self.assertEqual([(row['month'], row['transactions']) for row in months], [('2025-04', 1), ('2025-03', 2)])
+
+
+def _stop(location, aisle, bay, zone='A', level=None):
+    return {'location': location, 'location_name': f"L{location}", 'zone': zone, 'aisle': aisle, 'bay': bay, 'level': level}
+
+
+class PickRouteTests(TestCase):
+    # Routing works on plain dicts; no database needed
+
+    def test_serpentine_alternates_direction_per_aisle(self):
+        stops = [
+            _stop(1, 1, 5), _stop(2, 1, 1), _stop(3, 2, 2), _stop(4, 2, 8),
+            _stop(5, 3, 9), _stop(6, 3, 3), _stop(7, None, None), _stop(8, 1, 2, zone='B'),
+        ]
+        route = [stop['location'] for stop in serpentine_route(stops)]
+        # Aisle 1 up, aisle 2 down, aisle 3 up, then the next zone, unplaced last
+        self.assertEqual(route, [2, 1, 4, 3, 6, 5, 8, 7])
+
+    def test_nearest_neighbour_walks_to_the_closest_stop(self):
+        stops = [_stop(1, 1, 9), _stop(2, 1, 1), _stop(3, 2, 1), _stop(4, None, None)]
+        route = [stop['location'] for stop in nearest_neighbour_route(stops, depth=10)]
+        self.assertEqual(route, [2, 3, 1, 4])
+
+
+class PickListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(phone_number="1007")
+        cls.near = Warehouse.objects.create(owner=cls.user, name="Near", address="1 Dock Road")
+        cls.far = Warehouse.objects.create(owner=cls.user, name="Far", address="2 Dock Road")
+        cls.near_bins = [Location.objects.create(warehouse=cls.near, name=f"N{i}", zone='A', aisle=1, bay=i) for i in range(1, 4)]
+        cls.far_bin = Location.objects.create(warehouse=cls.far, name="F1", zone='A', aisle=1, bay=1)
+        cls.bolt = Product.objects.create(owner=cls.user, name="Bolt", sku="BOLT", cost_price=1, selling_price=2)
+        cls.nut = Product.objects.create(owner=cls.user, name="Nut", sku="NUT", cost_price=1, selling_price=2)
+        cls.washer = Product.objects.create(owner=cls.user, name="Washer", sku="WASHER", cost_price=1, selling_price=2)
+
+    def order(self, order_type, *lines):
+        order = Order.objects.create(owner=self.user, order_type=order_type)
+        for product, quantity in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, unit_price=1)
+        return order
+
+    def picks(self, result):
+        return [
+            (warehouse['name'], pick['location'], pick['product'], pick['batch'], pick['quantity'])
+            for warehouse in result['warehouses'] for pick in warehouse['picks']
+        ]
+
+    def test_warehouse_filling_the_most_lines_is_preferred(self):
+        # Far holds more bolts, but only Near can fill both lines
+        Stock.objects.create(product=self.bolt, location=self.far_bin, quantity=50)
+        Stock.objects.create(product=self.bolt, location=self.near_bins[0], quantity=5)
+        Stock.objects.create(product=self.nut, location=self.near_bins[1], quantity=5)
+        result = build_pick_list(self.order('SO', (self.bolt, 4), (self.nut, 2)))
+        self.assertEqual(self.picks(result), [
+            ('Near', self.near_bins[0].id, self.bolt.id, None, '4.00'),
+            ('Near', self.near_bins[1].id, self.nut.id, None, '2.00'),
+        ])
+        self.assertEqual(result['short'], [])
+
+    def test_expiring_batches_are_picked_first(self):
+        today = timezone.localdate()
+        later = Batch.objects.create(product=self.bolt, batch_number="L", expiry_date=today + timedelta(days=90))
+        sooner = Batch.objects.create(product=self.bolt, batch_number="S", expiry_date=today + timedelta(days=10))
+        Stock.objects.create(product=self.bolt, location=self.near_bins[0], batch=later, quantity=100)
+        Stock.objects.create(product=self.bolt, location=self.near_bins[2], batch=sooner, quantity=3)
+        result = build_pick_list(self.order('SO', (self.bolt, 5)))
+        self.assertEqual(self.picks(result), [
+            ('Near', self.near_bins[0].id, self.bolt.id, later.id, '2.00'),
+            ('Near', self.near_bins[2].id, self.bolt.id, sooner.id, '3.00'),
+        ])
+
+    def test_shortfall_is_reported(self):
+        Stock.objects.create(product=self.nut, location=self.near_bins[0], quantity=3)
+        result = build_pick_list(self.order('SO', (self.nut, 10), (self.washer, 1)))
+        self.assertEqual(self.picks(result), [('Near', self.near_bins[0].id, self.nut.id, None, '3.00')])
+        self.assertEqual(result['short'], [
+            {'product': self.nut.id, 'sku': 'NUT', 'requested': '10.00', 'allocated': '3.00'},
+            {'product': self.washer.id, 'sku': 'WASHER', 'requested': '1.00', 'allocated': '0.00'},
+        ])
+
+    def test_putaway_fills_held_bins_to_capacity_then_empty_ones(self):
+        held, other, empty = self.near_bins
+        Location.objects.filter(pk=held.pk).update(capacity=10)
+        Stock.objects.create(product=self.bolt, location=held, quantity=8)
+        # Nearer the dock than the empty bin, but holds another product
+        Location.objects.filter(pk=other.pk).update(bay=0)
+        Stock.objects.create(product=self.nut, location=other, quantity=1)
 
-# Create your tests here.
+        result = suggest_putaway(self.order('PO', (self.bolt, 7)), warehouse_id=self.near.id)
+        line, = result['lines']
+        self.assertEqual(
+            [(placement['location'], placement['quantity'], placement['existing']) for placement in line['placements']],
+            [(held.id, '2.00', True), (empty.id, '5.00', False)],
+        )
+        self.assertEqual(line['unplaced'], '0.00')
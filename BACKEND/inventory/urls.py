@@ -1,14 +1,21 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet, StockViewSet, OrderViewSet, AnalyticsViewSet
+from .views import ProductViewSet, StockViewSet, OrderViewSet, AnalyticsViewSet, JobViewSet, TransactionViewSet, TransferOrderViewSet, CycleCountViewSet, SyncViewSet, stock_events_view
 
 router = DefaultRouter()
 router.register(r'products', ProductViewSet)
 router.register(r'stock', StockViewSet)
 router.register(r'orders', OrderViewSet)
+router.register(r'transactions', TransactionViewSet)
+router.register(r'transfers', TransferOrderViewSet)
+router.register(r'cycle-counts', CycleCountViewSet)
+router.register(r'jobs', JobViewSet)
 # Registers the custom Analytics viewset
 router.register(r'analytics', AnalyticsViewSet, basename='analytics')
+router.register(r'sync', SyncViewSet, basename='sync')
 
 urlpatterns = [
+    # Must come before the router, which would otherwise treat 'events' as a stock id
+    path('stock/events/', stock_events_view, name='stock_events'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
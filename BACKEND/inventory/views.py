@@ -1,17 +1,333 @@
-from rest_framework import viewsets, status
+import asyncio
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from rest_framework import serializers, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, F
-from .models import Product, Stock, Order, InventoryTransaction, Supplier, Category, Warehouse, Location
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from django.db import transaction
+from django.db.models import Sum, F, Count, Q, OuterRef, Subquery
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Product, Stock, Order, OrderItem, InventoryTransaction, Supplier, Category, Warehouse, Location, Job, Tombstone, TransferOrder, CycleCount, SalesRollup, TransactionArchive
 from .serializers import (
     ProductSerializer, StockSerializer, OrderSerializer, 
     TransactionSerializer, SupplierSerializer, CategorySerializer,
-    WarehouseSerializer, LocationSerializer
+    WarehouseSerializer, LocationSerializer, JobSerializer, TransferOrderSerializer,
+    CycleCountSerializer, CycleCountEntrySerializer, AvailabilityLineSerializer
 )
+from .jobs import enqueue
+from .events import get_broker, stock_changed, stock_deleted
+from .idempotency import idempotent
 from .permissions import HasInventoryAccess
+from .signals import batched_tombstones
+from .picking import ROUTES, build_pick_list, suggest_putaway
+from .db_router import replica_request_scope, allow_replica_reads, pin_to_primary, is_pinned_to_primary
 
-class BaseInventoryViewSet(viewsets.ModelViewSet):
+MAX_AVAILABILITY_LINES = 1000
+CENTS = Decimal('0.01')
+
+# Bulk edits: rows per request, and per UPDATE/DELETE statement
+MAX_BULK_ITEMS = 10_000
+BULK_CHUNK_SIZE = 1000
+
+# ?group_by= of the sales report -> the keys of each row and the rollup columns they come from
+SALES_REPORT_GROUPS = {
+    'month': {'month': 'month'},
+    'product': {'product': 'product_id', 'sku': 'product__sku', 'name': 'product__name'},
+    'category': {'category': 'category_id', 'category_name': 'category__name'},
+}
+
+def parse_flag(data, name):
+    """
+    An optional boolean from the request body. JSON true/false and the strings
+    "true"/"false"/"1"/"0" are accepted; anything else is a 400, so a "false"
+    sent as a string is never taken as truthy.
+    """
+    try:
+        return serializers.BooleanField().run_validation(data.get(name, False))
+    except serializers.ValidationError as exc:
+        raise serializers.ValidationError({name: exc.detail})
+
+class ReplicaReadMixin:
+    """
+    Lets the actions named in `replica_actions` read from the replica database.
+    Any write pins the tenant to the primary for a short window, so the next
+    list they load already contains what they just saved.
+    """
+    replica_actions = ('list',)
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_request_scope():
+            response = super().dispatch(request, *args, **kwargs)
+
+        # self.request is DRF's Request, which carries the JWT-authenticated user
+        user = self.request.user
+        if self.request.method not in SAFE_METHODS and user.is_authenticated:
+            pin_to_primary(user.pk)
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        # Runs after authentication, so the user lookup itself always hits the primary
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and not is_pinned_to_primary(request.user.pk):
+            allow_replica_reads()
+
+class ValuesListMixin:
+    """
+    Read-only fast path for list(): rows come straight from queryset.values()
+    instead of one serializer instance per object. `list_fields` maps each
+    output key, in the serializer's order, to a values() lookup (annotations
+    from get_list_queryset() included); keys in `list_decimal_fields` are
+    stringified the way DecimalField does. The JSON must stay identical to the
+    serializer's, which inventory/tests.py checks.
+    """
+    list_fields = {}
+    list_decimal_fields = ()
+
+    def get_list_queryset(self):
+        return self.get_queryset()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_list_queryset()).values_list(*self.list_fields.values())
+        page = self.paginate_queryset(queryset)
+        rows = self.build_rows(page if page is not None else queryset)
+        if page is not None:
+            return self.get_paginated_response(rows)
+        return Response(rows)
+
+    def build_rows(self, values):
+        keys = tuple(self.list_fields)
+        decimals = [keys.index(key) for key in self.list_decimal_fields]
+        rows = []
+        for value in values:
+            if decimals:
+                value = list(value)
+                for i in decimals:
+                    if value[i] is not None:
+                        value[i] = str(value[i])
+            rows.append(dict(zip(keys, value)))
+        return rows
+
+class BulkEditMixin:
+    """
+    PATCH and DELETE on `bulk/`, for mass edits in one request. Rows are picked
+    with {"ids": [...]} or {"filter": {...}} (keys from `bulk_filters`). PATCH
+    either sets the same {"changes": {...}} on all of them with one UPDATE per
+    chunk, or applies per-row {"items": [{"id": ..., field: value}]} with
+    bulk_update. Only `bulk_fields` can be changed; values go through the
+    serializer's field validation and related ids are checked set-wise.
+    Everything runs in one transaction and the response is a summary.
+    """
+    bulk_fields = ()
+    bulk_filters = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        queryset = getattr(cls, 'queryset', None)
+        if queryset is None or cls.get_bulk_related is not BulkEditMixin.get_bulk_related:
+            return
+        # Fail at import, not on the first request, when a relation can't be owner-scoped
+        for name in cls.bulk_fields:
+            field = queryset.model._meta.get_field(name)
+            if field.is_relation and not _is_owned(field.related_model):
+                raise ImproperlyConfigured(
+                    f"{cls.__name__}.bulk_fields has '{name}', whose model has no owner: override get_bulk_related()."
+                )
+
+    def get_bulk_queryset(self):
+        # Owner-scoped and free of annotations, so update() and delete() work on it
+        return self.get_queryset()
+
+    def get_bulk_related(self, field):
+        """ Queryset of the rows a relation in `bulk_fields` may point to; by default the user's own. """
+        related_model = self.get_bulk_queryset().model._meta.get_field(field).related_model
+        return related_model._default_manager.filter(owner=self.request.user)
+
+    def bulk_changed(self, ids):
+        """ Hook run in the transaction after rows were updated. """
+
+    def bulk_deleted(self, ids):
+        """ Hook run in the transaction after rows were deleted. """
+
+    @action(detail=False, methods=['patch', 'delete'])
+    def bulk(self, request):
+        data = request.data if isinstance(request.data, dict) else {}
+        if request.method == 'DELETE':
+            return self._bulk_delete(data)
+        if 'items' in data:
+            return self._bulk_update_items(data['items'])
+        return self._bulk_update_all(data)
+
+    def _bulk_update_all(self, data):
+        changes = data.get('changes')
+        if not isinstance(changes, dict) or not changes:
+            return Response({'error': 'Send "changes", or per-row "items"'}, status=400)
+        cleaned, errors = self._clean_changes([changes])
+        if errors:
+            return Response({'error': 'Invalid changes', 'fields': errors[0]}, status=400)
+        ids, error = self._bulk_target(data)
+        if error:
+            return error
+
+        updated = 0
+        with transaction.atomic():
+            for chunk in _chunks(ids):
+                updated += self._rows(chunk).update(**cleaned[0], updated_at=timezone.now())
+            self.bulk_changed(ids)
+        return Response({'matched': len(ids), 'updated': updated})
+
+    def _bulk_update_items(self, items):
+        if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+            return Response({'error': '"items" must be a non-empty list of objects'}, status=400)
+        if len(items) > MAX_BULK_ITEMS:
+            return Response({'error': f'At most {MAX_BULK_ITEMS} items per request'}, status=400)
+        try:
+            ids = [int(item['id']) for item in items]
+        except (KeyError, TypeError, ValueError):
+            return Response({'error': 'Every item needs an integer "id"'}, status=400)
+        if len(set(ids)) != len(ids):
+            return Response({'error': 'Duplicate ids in "items"'}, status=400)
+
+        cleaned, errors = self._clean_changes([{k: v for k, v in item.items() if k != 'id'} for item in items])
+        if errors:
+            return Response({'error': 'Invalid changes', 'items': {ids[i]: fields for i, fields in errors.items()}}, status=400)
+        missing = set(ids) - self._owned_ids(ids)
+        if missing:
+            return Response({'error': 'Invalid id or access denied', 'ids': sorted(missing)}, status=400)
+
+        # bulk_update writes the same columns for every row, so group rows by the fields they change
+        model, now = self.get_bulk_queryset().model, timezone.now()
+        groups = {}
+        for pk, values in zip(ids, cleaned):
+            if values:
+                groups.setdefault(tuple(sorted(values)), []).append(model(pk=pk, updated_at=now, **values))
+        updated = 0
+        with transaction.atomic():
+            for fields, rows in groups.items():
+                updated += model.objects.bulk_update(rows, [*fields, 'updated_at'], batch_size=BULK_CHUNK_SIZE)
+            self.bulk_changed(ids)
+        return Response({'matched': len(ids), 'updated': updated})
+
+    def _bulk_delete(self, data):
+        ids, error = self._bulk_target(data)
+        if error:
+            return error
+
+        deleted = {}
+        with transaction.atomic(), batched_tombstones(self.request.user.id):
+            for chunk in _chunks(ids):
+                _, counts = self._rows(chunk).delete()
+                for label, count in counts.items():
+                    deleted[label] = deleted.get(label, 0) + count
+            self.bulk_deleted(ids)
+        label = self.get_bulk_queryset().model._meta.label
+        return Response({'deleted': deleted.pop(label, 0), 'cascaded': deleted})
+
+    def _bulk_target(self, data):
+        """ (ids, None) for the owned rows picked by "ids" or "filter", or (None, error response). """
+        ids, filters = data.get('ids'), data.get('filter')
+        if (ids is None) == (filters is None):
+            return None, Response({'error': 'Send either "ids" or "filter"'}, status=400)
+
+        if ids is not None:
+            if not isinstance(ids, list) or not ids or len(ids) > MAX_BULK_ITEMS:
+                return None, Response({'error': f'"ids" must be a list of 1 to {MAX_BULK_ITEMS} ids'}, status=400)
+            try:
+                ids = {int(pk) for pk in ids}
+            except (TypeError, ValueError):
+                return None, Response({'error': '"ids" must be integers'}, status=400)
+            missing = ids - self._owned_ids(ids)
+            if missing:
+                return None, Response({'error': 'Invalid id or access denied', 'ids': sorted(missing)}, status=400)
+            return sorted(ids), None
+
+        # An empty filter would match everything the user owns
+        if not isinstance(filters, dict) or not filters:
+            return None, Response({'error': f'"filter" needs at least one of: {", ".join(self.bulk_filters)}'}, status=400)
+        unknown = set(filters) - set(self.bulk_filters)
+        if unknown:
+            return None, Response({'error': f'Unknown filters: {", ".join(sorted(unknown))}'}, status=400)
+        # A list or object would be passed to the lookup as-is and quietly match nothing
+        if any(isinstance(value, (list, dict)) for value in filters.values()):
+            return None, Response({'error': 'Invalid filter value'}, status=400)
+        try:
+            queryset = self.get_bulk_queryset().filter(**{self.bulk_filters[key]: value for key, value in filters.items()})
+            return list(queryset.values_list('pk', flat=True).distinct().order_by('pk')), None
+        except (TypeError, ValueError, ValidationError):
+            return None, Response({'error': 'Invalid filter value'}, status=400)
+
+    def _rows(self, ids):
+        # The ids were checked against get_bulk_queryset() already; filtering on the
+        # primary key alone keeps joins (e.g. stock -> product owner) out of UPDATE/DELETE
+        return self.get_bulk_queryset().model._default_manager.filter(pk__in=ids)
+
+    def _owned_ids(self, ids):
+        owned = set()
+        for chunk in _chunks(list(ids)):
+            owned.update(self.get_bulk_queryset().filter(pk__in=chunk).values_list('pk', flat=True))
+        return owned
+
+    def _clean_changes(self, rows):
+        """
+        Validates each {field: value} dict. Returns the cleaned dicts (relations
+        as `<field>_id`) and {row index: {field: errors}} for the invalid ones.
+        """
+        fields = self.get_serializer().fields
+        model = self.get_bulk_queryset().model
+        cleaned, errors, related = [], {}, {}
+        for i, row in enumerate(rows):
+            values, row_errors = {}, {}
+            for name, value in row.items():
+                if name not in self.bulk_fields:
+                    row_errors[name] = ['This field cannot be bulk edited.']
+                    continue
+                model_field = model._meta.get_field(name)
+                if model_field.is_relation:
+                    if value is not None:
+                        try:
+                            value = int(value)
+                        except (TypeError, ValueError):
+                            row_errors[name] = ['Expected an id or null.']
+                            continue
+                        related.setdefault(name, {}).setdefault(value, []).append(i)
+                    values[model_field.attname] = value
+                    continue
+                try:
+                    values[name] = fields[name].run_validation(value)
+                except serializers.ValidationError as exc:
+                    row_errors[name] = exc.detail
+            cleaned.append(values)
+            if row_errors:
+                errors[i] = row_errors
+
+        # One query per relation for all rows
+        for name, targets in related.items():
+            found = set(self.get_bulk_related(name).filter(pk__in=targets).values_list('pk', flat=True))
+            for pk in targets.keys() - found:
+                for i in targets[pk]:
+                    errors.setdefault(i, {})[name] = ['Invalid id or access denied.']
+        return cleaned, errors
+
+
+def _chunks(ids):
+    for i in range(0, len(ids), BULK_CHUNK_SIZE):
+        yield ids[i:i + BULK_CHUNK_SIZE]
+
+
+def _is_owned(model):
+    return any(field.name == 'owner' for field in model._meta.get_fields())
+
+
+class BaseInventoryViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     A Base ViewSet that AUTOMATICALLY filters all data by the logged-in user (owner).
     It also assigns the owner automatically when creating new items.
@@ -28,10 +344,116 @@ class BaseInventoryViewSet(viewsets.ModelViewSet):
 
 # --- VIEWSETS INHERITING FROM BASE (Isolated Data) ---
 
-class ProductViewSet(BaseInventoryViewSet):
+class ProductViewSet(ValuesListMixin, BulkEditMixin, BaseInventoryViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    
+    replica_actions = ('list', 'low_stock')
+    # Tokens per request (core.throttling); unlisted actions cost 1 to read, 2 to write
+    throttle_costs = {'list': 5, 'availability': 5, 'bulk': 20}
+    bulk_fields = (
+        'category', 'description', 'cost_price', 'selling_price', 'uom',
+        'low_stock_threshold', 'abc_classification', 'is_batch_tracked', 'is_kit',
+    )
+    bulk_filters = {
+        'category': 'category', 'sku_prefix': 'sku__startswith', 'uom': 'uom',
+        'abc_classification': 'abc_classification', 'is_kit': 'is_kit',
+        # Products that appear on the supplier's purchase orders
+        'supplier': 'orderitem__order__supplier',
+    }
+    # Same keys and order as ProductSerializer
+    list_fields = {
+        'id': 'id', 'owner': 'owner__phone_number', 'total_stock': 'total_stock', 'category_name': 'category__name',
+        'name': 'name', 'sku': 'sku', 'barcode': 'barcode', 'description': 'description',
+        'cost_price': 'cost_price', 'selling_price': 'selling_price', 'uom': 'uom',
+        'low_stock_threshold': 'low_stock_threshold', 'abc_classification': 'abc_classification',
+        'is_batch_tracked': 'is_batch_tracked', 'is_kit': 'is_kit',
+        'created_at': 'created_at', 'updated_at': 'updated_at', 'category': 'category_id',
+    }
+    list_decimal_fields = ('cost_price', 'selling_price')
+
+    def get_list_queryset(self):
+        return self.get_queryset().annotate(total_stock=Sum('stock__quantity')).order_by('pk')
+
+    def build_rows(self, values):
+        rows = super().build_rows(values)
+        for row in rows:
+            # ProductSerializer.get_total_stock returns 0 for products without stock rows
+            if row['total_stock'] is None:
+                row['total_stock'] = 0
+            # and DRF leaves out category.name entirely when there is no category
+            if row['category'] is None:
+                del row['category_name']
+        return rows
+
+    @action(detail=False, methods=['post'])
+    def availability(self, request):
+        """
+        Body: {"lines": [{"product": 1, "quantity": "5"}, ...]}. Returns on-hand,
+        reserved (lines of CONFIRMED sales orders) and available per product,
+        with on-hand split per warehouse, from one grouped query. Reservations
+        aren't tied to a warehouse, so they're only subtracted per product.
+        """
+        lines = AvailabilityLineSerializer(data=request.data.get('lines', []), many=True)
+        lines.is_valid(raise_exception=True)
+        if not lines.validated_data:
+            return Response({'error': 'At least one line is required'}, status=400)
+        if len(lines.validated_data) > MAX_AVAILABILITY_LINES:
+            return Response({'error': f'At most {MAX_AVAILABILITY_LINES} lines per request'}, status=400)
+
+        requested = {}
+        for line in lines.validated_data:
+            requested[line['product']] = requested.get(line['product'], 0) + line['quantity']
+
+        reserved = (
+            OrderItem.objects.filter(
+                product=OuterRef('pk'), order__owner=request.user, order__order_type='SO', order__status='CONFIRMED'
+            )
+            .values('product')
+            .annotate(total=Sum('quantity'))
+            .values('total')
+        )
+        # One row per (product, warehouse holding it); products without stock get one row with no warehouse
+        rows = (
+            Product.objects.filter(owner=request.user, id__in=requested)
+            .values('id', 'sku', 'name', 'stock__location__warehouse_id', 'stock__location__warehouse__name')
+            .annotate(on_hand=Sum('stock__quantity'), reserved=Subquery(reserved))
+            .order_by('id', 'stock__location__warehouse_id')
+        )
+
+        results = {}
+        for row in rows:
+            entry = results.get(row['id'])
+            if entry is None:
+                entry = results[row['id']] = {
+                    'product': row['id'], 'sku': row['sku'], 'name': row['name'],
+                    'on_hand': Decimal(0), 'reserved': Decimal(row['reserved'] or 0), 'warehouses': [],
+                }
+            if row['stock__location__warehouse_id'] is not None:
+                entry['on_hand'] += row['on_hand'] or 0
+                entry['warehouses'].append({
+                    'warehouse': row['stock__location__warehouse_id'],
+                    'name': row['stock__location__warehouse__name'],
+                    'on_hand': str(Decimal(row['on_hand'] or 0).quantize(CENTS)),
+                })
+
+        missing = set(requested) - set(results)
+        if missing:
+            return Response({'error': 'Invalid product or access denied', 'products': sorted(missing)}, status=400)
+
+        response = []
+        for product_id, quantity in requested.items():
+            entry = results[product_id]
+            available = entry['on_hand'] - entry['reserved']
+            response.append({
+                **entry,
+                'requested': str(quantity),
+                'on_hand': str(entry['on_hand'].quantize(CENTS)),
+                'reserved': str(entry['reserved'].quantize(CENTS)),
+                'available': str(available.quantize(CENTS)),
+                'sufficient': available >= quantity,
+            })
+        return Response({'lines': response, 'all_available': all(line['sufficient'] for line in response)})
+
     @action(detail=False, methods=['get'])
     def low_stock(self, request):
         # We must filter by owner manually here inside the custom action
@@ -54,8 +476,15 @@ class WarehouseViewSet(BaseInventoryViewSet):
 class OrderViewSet(BaseInventoryViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    replica_actions = ('list', 'pick_list', 'putaway')
+    throttle_costs = {'complete_order': 10, 'pick_list': 5, 'putaway': 5}
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def complete_order(self, request, pk=None):
         order = self.get_object() # get_object already filters by owner via get_queryset
         
@@ -67,30 +496,254 @@ class OrderViewSet(BaseInventoryViewSet):
              return Response({'error': 'Location ID required'}, status=400)
 
         # Validate location belongs to user
-        if not Location.objects.filter(id=location_id, warehouse__owner=request.user).exists():
+        location = Location.objects.filter(id=location_id, warehouse__owner=request.user).first()
+        if location is None:
              return Response({'error': 'Invalid location or access denied'}, status=403)
 
-        for item in order.items.all():
-            tx_type = 'IN' if order.order_type == 'PO' else 'OUT'
-            
-            # Create Transaction (stamped with owner)
-            InventoryTransaction.objects.create(
-                transaction_type=tx_type,
-                owner=request.user, # Explicitly set owner
-                product=item.product,
-                quantity=item.quantity,
-                source_location_id=None if tx_type == 'IN' else location_id,
-                destination_location_id=location_id if tx_type == 'IN' else None,
-                reference=f"Order #{order.id}"
+        # Large orders can be handed to the run_jobs worker instead of blocking this request
+        if parse_flag(request.data, 'run_async'):
+            job = enqueue(
+                request.user, 'complete_order',
+                payload={'order_id': order.id, 'location_id': location.id},
+                dedupe_key=f"complete_order:{order.id}",
             )
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
-        order.status = 'COMPLETED'
-        order.save()
+        if not order.complete(location):
+            return Response({'error': 'Order already completed'}, status=400)
         return Response({'status': 'Order processed and stock updated'})
 
+    @action(detail=True, methods=['get'])
+    def pick_list(self, request, pk=None):
+        """ Picks for a sales order, grouped by warehouse in walking order. ?strategy=serpentine (default) or nearest. """
+        order = self.get_object()
+        if order.order_type != 'SO':
+            return Response({'error': 'Pick lists are for sales orders'}, status=400)
+        if order.status == 'COMPLETED':
+            return Response({'error': 'Order already completed'}, status=400)
+        strategy = request.query_params.get('strategy', 'serpentine')
+        if strategy not in ROUTES:
+            return Response({'error': f"strategy must be one of: {', '.join(ROUTES)}"}, status=400)
+        return Response(build_pick_list(order, strategy))
+
+    @action(detail=True, methods=['get'])
+    def putaway(self, request, pk=None):
+        """ Where to store a purchase order's lines on receipt. ?warehouse= limits it to one warehouse. """
+        order = self.get_object()
+        if order.order_type != 'PO':
+            return Response({'error': 'Putaway is for purchase orders'}, status=400)
+        if order.status == 'COMPLETED':
+            return Response({'error': 'Order already completed'}, status=400)
+        warehouse_id = request.query_params.get('warehouse')
+        if warehouse_id is not None:
+            if not warehouse_id.isdigit() or not Warehouse.objects.filter(pk=warehouse_id, owner=request.user).exists():
+                return Response({'error': 'Invalid warehouse or access denied'}, status=403)
+            warehouse_id = int(warehouse_id)
+        return Response(suggest_putaway(order, warehouse_id))
+
+class TransferOrderViewSet(BaseInventoryViewSet):
+    """ Multi-line stock moves between two locations, executed as one bulk operation. """
+    queryset = TransferOrder.objects.all()
+    serializer_class = TransferOrderSerializer
+    http_method_names = ['get', 'post', 'head', 'options']
+    throttle_costs = {'execute': 10}
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('owner').prefetch_related('lines__product')
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def execute(self, request, pk=None):
+        transfer = self.get_object()
+        if transfer.status == 'COMPLETED':
+            return Response({'error': 'Transfer already completed'}, status=400)
+
+        # Very large transfers can be handed to the run_jobs worker
+        if parse_flag(request.data, 'run_async'):
+            job = enqueue(
+                request.user, 'execute_transfer',
+                payload={'transfer_id': transfer.id},
+                dedupe_key=f"execute_transfer:{transfer.id}",
+            )
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        try:
+            if not transfer.execute():
+                return Response({'error': 'Transfer already completed'}, status=400)
+        except ValidationError as exc:
+            return Response(exc.message_dict, status=400)
+        return Response({'status': 'Transfer completed', 'lines': transfer.lines.count()})
+
+class CycleCountViewSet(BaseInventoryViewSet):
+    """
+    Stock counts. Creating one snapshots the expected quantities, counts are
+    submitted in bulk and posting writes all variances as ADJ transactions.
+    """
+    queryset = CycleCount.objects.all()
+    serializer_class = CycleCountSerializer
+    http_method_names = ['get', 'post', 'head', 'options']
+    throttle_costs = {'create': 10, 'counts': 5, 'post_variances': 10}
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('owner').annotate(
+            line_count=Count('lines'),
+            counted_lines=Count('lines', filter=Q(lines__counted_quantity__isnull=False)),
+        )
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            serializer.instance.take_snapshot()
+        # Fill the annotations for the response without re-querying
+        serializer.instance.line_count = serializer.instance.lines.count()
+        serializer.instance.counted_lines = 0
+
+    @action(detail=True, methods=['get'])
+    def lines(self, request, pk=None):
+        count = self.get_object()
+        lines = count.lines.order_by('location_id', 'product_id')
+        if parse_flag(request.query_params, 'uncounted'):
+            lines = lines.filter(counted_quantity__isnull=True)
+        rows = lines.values(
+            'id', 'product_id', 'product__name', 'location_id', 'batch_id', 'expected_quantity', 'counted_quantity'
+        )
+        return Response([
+            {
+                'id': row['id'],
+                'product': row['product_id'],
+                'product_name': row['product__name'],
+                'location': row['location_id'],
+                'batch': row['batch_id'],
+                'expected_quantity': row['expected_quantity'],
+                'counted_quantity': row['counted_quantity'],
+            }
+            for row in rows
+        ])
+
+    @action(detail=True, methods=['post'])
+    def counts(self, request, pk=None):
+        """ Body: {"entries": [{"product": 1, "location": 2, "counted": "5"}, ...]}. Re-submitting overwrites. """
+        count = self.get_object()
+        if count.status != 'OPEN':
+            return Response({'error': f'Count is {count.status.lower()}'}, status=400)
+
+        entries = CycleCountEntrySerializer(data=request.data.get('entries', []), many=True)
+        entries.is_valid(raise_exception=True)
+        try:
+            updated, added = count.record_counts(entries.validated_data)
+        except ValidationError as exc:
+            return Response(exc.message_dict, status=400)
+        return Response({'updated': updated, 'added': added})
+
+    # Not named post(): that would shadow the viewset's HTTP method handler
+    @action(detail=True, methods=['post'], url_path='post')
+    @idempotent
+    def post_variances(self, request, pk=None):
+        count = self.get_object()
+        if count.status != 'OPEN':
+            return Response({'error': f'Count is {count.status.lower()}'}, status=400)
+
+        uncounted_as_zero = parse_flag(request.data, 'uncounted_as_zero')
+        if parse_flag(request.data, 'run_async'):
+            job = enqueue(
+                request.user, 'post_cycle_count',
+                payload={'count_id': count.id, 'uncounted_as_zero': uncounted_as_zero},
+                dedupe_key=f"post_cycle_count:{count.id}",
+            )
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        summary = count.post(uncounted_as_zero=uncounted_as_zero)
+        if summary is None:
+            return Response({'error': 'Count already posted'}, status=400)
+        return Response({'status': 'Count posted', **summary})
+
+class TransactionViewSet(BaseInventoryViewSet):
+    """
+    The stock ledger. Append-only: corrections are posted as new ADJ transactions.
+    Months moved out by archive_transactions are read through `archived/`.
+    """
+    queryset = InventoryTransaction.objects.all()
+    serializer_class = TransactionSerializer
+    http_method_names = ['get', 'post', 'head', 'options']
+    replica_actions = ('list', 'archived')
+    throttle_costs = {'list': 5, 'archived': 5}
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('owner', 'product').order_by('-created_at')
+
+    @action(detail=False, methods=['get'])
+    def archived(self, request):
+        """
+        Without ?month=, the archived months with their row counts and totals.
+        With ?month=YYYY-MM, that month's transactions, newest first, in the
+        same shape as the live list; ?product= and ?transaction_type= filter them.
+        """
+        archives = TransactionArchive.objects.filter(owner=request.user)
+        value = request.query_params.get('month')
+        if not value:
+            months = archives.order_by('-month').values('month', 'row_count', 'totals')
+            return Response([
+                {'month': f"{row['month']:%Y-%m}", 'transactions': row['row_count'], 'totals': row['totals']}
+                for row in months
+            ])
+
+        try:
+            month = datetime.strptime(value, '%Y-%m').date()
+        except ValueError:
+            return Response({'error': 'month must be YYYY-MM'}, status=400)
+        archive = archives.filter(month=month).first()
+        rows = archive.transactions() if archive else []
+
+        product = request.query_params.get('product')
+        if product:
+            rows = [row for row in rows if str(row.product_id) == product]
+        tx_type = request.query_params.get('transaction_type')
+        if tx_type:
+            rows = [row for row in rows if row.transaction_type == tx_type]
+
+        # Live products only, as with the live ledger (deleting a product deletes its transactions)
+        products = Product.objects.filter(owner=request.user).in_bulk({row.product_id for row in rows})
+        rows = [row for row in reversed(rows) if row.product_id in products]
+        for row in rows:
+            row.owner = request.user
+            row.product = products[row.product_id]
+        return Response(self.get_serializer(rows, many=True).data)
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        # Product and locations must belong to the user posting the movement
+        data = serializer.validated_data
+        if data['product'].owner_id != self.request.user.id:
+            raise PermissionDenied("Invalid product or access denied")
+        for field in ('source_location', 'destination_location'):
+            location = data.get(field)
+            if location is not None and location.warehouse.owner_id != self.request.user.id:
+                raise PermissionDenied("Invalid location or access denied")
+        super().perform_create(serializer)
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """ Status of queued background jobs (poll /jobs/<id>/ after a 202 response). """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated, HasInventoryAccess]
+
+    def get_queryset(self):
+        return Job.objects.filter(owner=self.request.user).order_by('-created_at')
+
 # --- STOCK & LOCATIONS (Slightly different filtering) ---
 
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
     permission_classes = [IsAuthenticated, HasInventoryAccess]
@@ -99,19 +752,41 @@ class LocationViewSet(viewsets.ModelViewSet):
         # Filter locations by warehouses owned by the user
         return Location.objects.filter(warehouse__owner=self.request.user)
 
-class StockViewSet(viewsets.ModelViewSet):
+class StockViewSet(ValuesListMixin, BulkEditMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Stock.objects.all()
     serializer_class = StockSerializer
     permission_classes = [IsAuthenticated, HasInventoryAccess]
+    throttle_costs = {'list': 5, 'bulk': 20}
+    # Like PATCH on one row, this sets balances without ledger entries; cycle counts post audited corrections
+    bulk_fields = ('quantity',)
+    bulk_filters = {'product': 'product', 'location': 'location', 'warehouse': 'location__warehouse', 'batch': 'batch'}
+    # Same keys and order as StockSerializer
+    list_fields = {
+        'id': 'id', 'product': 'product_id', 'location': 'location_id', 'location_name': 'location__name',
+        'warehouse_name': 'location__warehouse__name', 'quantity': 'quantity', 'batch': 'batch_id',
+    }
+    list_decimal_fields = ('quantity',)
+
+    def get_list_queryset(self):
+        return self.get_queryset().order_by('pk')
 
     def get_queryset(self):
         # Filter stock by products owned by the user
         return Stock.objects.filter(product__owner=self.request.user)
 
+    def bulk_changed(self, ids):
+        stock_changed(self.request.user.id, ids)
+
+    def bulk_deleted(self, ids):
+        for stock_id in ids:
+            stock_deleted(self.request.user.id, stock_id)
+
 # --- ANALYTICS ---
 
-class AnalyticsViewSet(viewsets.ViewSet):
+class AnalyticsViewSet(ReplicaReadMixin, viewsets.ViewSet):
     permission_classes = [IsAuthenticated, HasInventoryAccess]
+    replica_actions = ('dashboard_stats', 'sales_report', 'supplier_scorecard')
+    throttle_costs = {'dashboard_stats': 20, 'sales_report': 5, 'reconcile_stock': 20, 'refresh_lead_times': 20}
 
     @action(detail=False, methods=['get'])
     def dashboard_stats(self, request):
@@ -130,10 +805,209 @@ class AnalyticsViewSet(viewsets.ViewSet):
 
         # 4. Items Sold (User only)
         sales_tx = InventoryTransaction.objects.filter(owner=user, transaction_type='OUT').aggregate(total=Sum('quantity'))['total'] or 0
+        sales_tx += sum(Decimal(totals.get('OUT', 0)) for totals in TransactionArchive.objects.filter(owner=user).values_list('totals', flat=True))
 
         return Response({
             "total_products": total_products,
             "low_stock_alert": low_stock_count,
             "inventory_valuation": total_value,
             "items_sold_period": sales_tx
-        })
\ No newline at end of file
+        })
+
+    @action(detail=False, methods=['get'])
+    def sales_report(self, request):
+        """
+        Units, revenue, cost and margin from the monthly sales rollups.
+        ?from= and ?to= are months (YYYY-MM, inclusive); ?group_by= is month
+        (default), product or category.
+        """
+        group_by = request.query_params.get('group_by', 'month')
+        if group_by not in SALES_REPORT_GROUPS:
+            return Response({'error': f"group_by must be one of: {', '.join(SALES_REPORT_GROUPS)}"}, status=400)
+
+        rollups = SalesRollup.objects.filter(owner=request.user)
+        for param, lookup in (('from', 'month__gte'), ('to', 'month__lte')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    month = datetime.strptime(value, '%Y-%m').date()
+                except ValueError:
+                    return Response({'error': f"{param} must be a month as YYYY-MM"}, status=400)
+                rollups = rollups.filter(**{lookup: month})
+
+        keys = SALES_REPORT_GROUPS[group_by]
+        rows = (
+            rollups.values(*keys.values())
+            .annotate(units=Sum('units'), revenue=Sum('revenue'), cost=Sum('cost'))
+            .order_by(*keys.values())
+        )
+        report = []
+        for row in rows:
+            revenue, cost = row['revenue'].quantize(CENTS), row['cost'].quantize(CENTS)
+            margin = revenue - cost
+            entry = {key: row[field] for key, field in keys.items()}
+            entry.update(
+                units=row['units'],
+                revenue=str(revenue),
+                cost=str(cost),
+                margin=str(margin),
+                margin_pct=str((margin * 100 / revenue).quantize(CENTS)) if revenue else None,
+            )
+            report.append(entry)
+        return Response({'group_by': group_by, 'rows': report})
+
+    @action(detail=False, methods=['get'])
+    def supplier_scorecard(self, request):
+        """
+        Stated vs. measured lead times per supplier, read from the figures stored
+        by the refresh_lead_times job, so it costs one query whatever the PO history.
+        Slowest (by p90) first; suppliers without completed POs last.
+        """
+        suppliers = (
+            Supplier.objects.filter(owner=request.user)
+            .order_by(F('lead_time_p90_days').desc(nulls_last=True), 'name')
+            .values('id', 'name', 'lead_time_days', 'lead_time_samples', 'lead_time_mean_days', 'lead_time_p90_days', 'lead_time_updated_at')
+        )
+        rows = []
+        for supplier in suppliers:
+            p90 = supplier['lead_time_p90_days']
+            rows.append({
+                'supplier': supplier['id'],
+                'name': supplier['name'],
+                'stated_lead_time_days': supplier['lead_time_days'],
+                'completed_orders': supplier['lead_time_samples'],
+                'mean_days': str(supplier['lead_time_mean_days']) if supplier['lead_time_mean_days'] is not None else None,
+                'p90_days': str(p90) if p90 is not None else None,
+                # How much later than promised the slow deliveries arrive
+                'p90_over_stated_days': str(p90 - supplier['lead_time_days']) if p90 is not None else None,
+                'updated_at': supplier['lead_time_updated_at'],
+            })
+        return Response(rows)
+
+    @action(detail=False, methods=['post'])
+    def refresh_lead_times(self, request):
+        # The grouped queries read all PO history, so it always runs in the background
+        job = enqueue(request.user, 'refresh_lead_times')
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['post'])
+    def reconcile_stock(self, request):
+        # Ledger vs. stock comparison scans the whole history, so it always runs in the background
+        job = enqueue(request.user, 'reconcile_stock')
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+# --- DELTA SYNC ---
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    Everything that changed for the user since `?cursor=`, for offline-capable clients.
+    Call without a cursor for a full snapshot, then pass back the returned cursor.
+    Rows are upserts keyed by id; `deleted` lists ids to drop. Stock of a deleted
+    product or location is dropped client-side without its own tombstone.
+    """
+    permission_classes = [IsAuthenticated, HasInventoryAccess]
+    throttle_costs = {'list': 10}
+
+    def list(self, request):
+        user = request.user
+        # Taken before reading; see the overlap applied to the returned cursor
+        issued_at = timezone.now()
+
+        since = None
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                since = parse_datetime(cursor)
+            except ValueError:
+                since = None
+            # Cursors handed out carry an offset; a naive one can't be compared safely
+            if since is None or timezone.is_naive(since):
+                return Response({'error': 'Invalid cursor'}, status=400)
+            retention = timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+            if since < issued_at - retention:
+                # Tombstones that old are purged, so only a full snapshot is safe
+                since = None
+
+        def changed(queryset):
+            return queryset if since is None else queryset.filter(updated_at__gt=since)
+
+        products = changed(Product.objects.filter(owner=user)).select_related('owner', 'category').annotate(
+            stock_total=Sum('stock__quantity')
+        )
+        categories = changed(Category.objects.filter(owner=user)).select_related('owner')
+        locations = changed(Location.objects.filter(warehouse__owner=user))
+        stock = changed(Stock.objects.filter(product__owner=user)).select_related('location__warehouse')
+        orders = changed(Order.objects.filter(owner=user)).select_related('owner').prefetch_related('items__product')
+
+        deleted = {}
+        if since is not None:
+            tombstones = Tombstone.objects.filter(owner=user, deleted_at__gt=since).values_list('model_name', 'object_id')
+            for model_name, object_id in tombstones:
+                deleted.setdefault(model_name, []).append(object_id)
+
+        # A write stamped just before issued_at may commit after we read. Handing back
+        # a slightly earlier cursor means the next sync repeats a few rows (harmless
+        # for upserts) instead of silently missing one.
+        next_cursor = issued_at - timedelta(seconds=settings.SYNC_CURSOR_OVERLAP_SECONDS)
+
+        return Response({
+            # 'Z' rather than '+00:00' so the cursor survives being pasted into a query string
+            'cursor': next_cursor.isoformat().replace('+00:00', 'Z'),
+            'full': since is None,
+            'products': ProductSerializer(products, many=True).data,
+            'categories': CategorySerializer(categories, many=True).data,
+            'locations': LocationSerializer(locations, many=True).data,
+            'stock': StockSerializer(stock, many=True).data,
+            'orders': OrderSerializer(orders, many=True).data,
+            'deleted': deleted,
+        })
+
+# --- LIVE STOCK FEED (server-sent events, served by the ASGI app) ---
+
+def _authenticate_stream(request):
+    """
+    EventSource can't send an Authorization header, so the access token comes in
+    the query string. Applies the same license checks as the REST endpoints.
+    """
+    auth = JWTAuthentication()
+    try:
+        user = auth.get_user(auth.get_validated_token(request.GET.get('token', '')))
+    except (InvalidToken, TokenError):
+        return None, "Invalid or expired token."
+
+    request.user = user
+    permission = HasInventoryAccess()
+    if not permission.has_permission(request, None):
+        return None, permission.message
+    return user, None
+
+async def stock_events_view(request):
+    """
+    Streams compact stock balance changes for the logged-in tenant:
+
+        event: stock
+        data: {"type": "stock", "id": 12, "product": 3, "location": 1, "batch": null, "quantity": "40.00"}
+
+    Clients load /stock/ once and then apply these. A {"type": "resync"} event means
+    the client fell behind and should reload the list.
+    """
+    user, error = await sync_to_async(_authenticate_stream)(request)
+    if user is None:
+        return HttpResponse(json.dumps({'error': error}), status=401, content_type='application/json')
+
+    async def stream():
+        yield "retry: 3000\n\n"
+        async with get_broker().subscribe(user.pk) as queue:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
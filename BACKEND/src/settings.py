@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack. Removes itself when disabled.
+    'core.instrumentation.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -82,12 +88,93 @@ WSGI_APPLICATION = 'src.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Configured from the environment so production can run on PostgreSQL while
+# local development keeps the zero-setup SQLite file:
+#   DB_ENGINE=postgres DB_NAME=... DB_USER=... DB_PASSWORD=... DB_HOST=... DB_PORT=...
+#   DB_CONN_MAX_AGE=60  (seconds to keep a connection open between requests)
+#   DB_POOL=1           (use psycopg's connection pool instead of persistent connections)
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'modern_tracker'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            # Ping reused connections once per request so a restarted server doesn't surface as a 500
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+
+    if os.environ.get('DB_POOL') == '1':
+        # The pool manages connection lifetime itself, so persistent connections must be off
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # WAL lets readers continue while a transaction is being written
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+                # Take the write lock up front so concurrent writers queue on the
+                # busy timeout instead of failing with "database is locked"
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': int(os.environ.get('DB_BUSY_TIMEOUT', 20)),
+            },
+            # A file (not the in-memory default) so threaded tests get WAL and the busy timeout
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
     }
-}
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+# The API throttle buckets and the replica read-your-writes pins live in the
+# default cache, so every worker process must see the same one. Without
+# CACHE_REDIS_URL (e.g. redis://localhost:6379/0) each process keeps its own
+# in-memory cache, which only suits a single-process development server.
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_REDIS_URL'],
+        }
+    }
+
+# Optional read replica. Analytics and list endpoints read from it unless the
+# tenant wrote recently (see inventory/db_router.py). For local testing point
+# DB_REPLICA_NAME at a copy of the SQLite file or a second PostgreSQL database.
+REPLICA_DB_ALIAS = 'replica'
+REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+
+if os.environ.get('DB_REPLICA_NAME') or os.environ.get('DB_REPLICA_HOST'):
+    if 'CACHES' not in globals():
+        # A per-process pin would let the next request, served by another
+        # worker, read from the replica and miss the tenant's own write
+        raise ImproperlyConfigured("A read replica needs a shared cache: set CACHE_REDIS_URL.")
+    DATABASES[REPLICA_DB_ALIAS] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        # Tests run against the primary only
+        'TEST': {'MIRROR': 'default'},
+    }
+    if 'DB_REPLICA_HOST' in os.environ:
+        DATABASES[REPLICA_DB_ALIAS]['HOST'] = os.environ['DB_REPLICA_HOST']
+
+DATABASE_ROUTERS = ['inventory.db_router.ReplicaRouter']
 
 
 # Password validation
@@ -146,11 +233,55 @@ CSRF_TRUSTED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Mobile clients send Idempotency-Key on POSTs they may retry
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+
+# Pub/sub behind the live stock feed (/api/inventory/stock/events/). The default only
+# reaches clients connected to the same ASGI process.
+STOCK_EVENTS_BROKER = 'inventory.events.InProcessBroker'
+
+# Delta sync (/api/inventory/sync/). Cursors older than the retention get a full snapshot.
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+SYNC_CURSOR_OVERLAP_SECONDS = 5
+
+# archive_transactions moves whole months older than this out of the live ledger
+TRANSACTION_ARCHIVE_AFTER_DAYS = 365
+
+# Supplier lead times are measured over purchase orders completed this recently
+SUPPLIER_LEAD_TIME_WINDOW_DAYS = 365
+
+# Request instrumentation: Server-Timing headers and /api/metrics/ (Prometheus).
+# Slow requests are logged to core.instrumentation; set the threshold to None to stop.
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '') == '1'
+INSTRUMENTATION_SLOW_REQUEST_MS = int(os.environ.get('INSTRUMENTATION_SLOW_REQUEST_MS', 1000))
+INSTRUMENTATION_LOG_SQL = os.environ.get('INSTRUMENTATION_LOG_SQL', '') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Per-account token buckets (core.throttling). A request spends its view's cost, buckets
+# refill continuously up to their capacity, and the tier comes from the SerialKey.
+TENANT_THROTTLE_ENABLED = True
+THROTTLE_TIERS = {
+    'basic': {'capacity': 120, 'refill_per_second': 1},
+    'standard': {'capacity': 300, 'refill_per_second': 5},
+    'premium': {'capacity': 1200, 'refill_per_second': 20},
+}
+THROTTLE_DEFAULT_TIER = 'standard'
+
 # Configure REST Framework to use JWT
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # orjson-backed JSON (same output as DRF's renderer, faster); MessagePack on Accept: application/msgpack
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.throttling.TenantTokenBucketThrottle',
+    ),
 }
 
 from datetime import timedelta